@@ -0,0 +1,449 @@
+"""
+Map derived annotations (local resolution & model quality per residue)
+
+The annotation files (<pdb_id>.<algorithm>.aa.pdb) carry the value of each
+residue in the B-factor column. Parsing them is done once per file: the values
+are kept per chain as NumPy arrays in an AnnotationStore, saved as .npz in
+ANNOTATIONS_CACHE_DIR and invalidated when the source file mtime changes.
+
+Annotation files are located through the DataFile table (populated by the
+`register_annotation_files` command) or, for files not registered yet, through
+an in-process filename -> path index, instead of listing the data dirs.
+"""
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from django.db import transaction
+
+from .caches import MtimeCache
+from .dataPaths import EMDB_DATA_DIR, MODIFIED_PDBS_ANN_DIR, ANNOTATIONS_CACHE_DIR
+from .models import Entry, DataFile, ENTRY_TYPES
+
+logger = logging.getLogger(__name__)
+
+DEEP_RES_FNAME_TEMPLATE = "%(pdb_id)s.deepres.aa.pdb"
+MONORES_FNAME_TEMPLATE = "%(pdb_id)s.monores.aa.pdb"
+BLOCRES_FNAME_TEMPLATE = "%(pdb_id)s.blocres.aa.pdb"
+MAPQ_FNAME_TEMPLATE = "%(pdb_id)s.mapq.aa.pdb"
+DAQ_FNAME_TEMPLATE = "%(pdb_id)s.daq.aa.pdb"
+FSCQ_TEMPLATE = "%(pdb_id)s.fscq.aa.pdb"
+ANN_TYPES_DICT = {
+    "localResolution": {
+        "deepres": DEEP_RES_FNAME_TEMPLATE,
+        "monores": MONORES_FNAME_TEMPLATE,
+        "blocres": BLOCRES_FNAME_TEMPLATE
+    },
+    "modelQuality": {
+        "mapq": MAPQ_FNAME_TEMPLATE,
+        "fscq": FSCQ_TEMPLATE,
+        "daq": DAQ_FNAME_TEMPLATE
+    }
+}
+ANN_TYPES_MIN_VAL = {
+    "localResolution": {
+        "deepres": 1.5,
+        "monores": 1.5,
+        "blocres": 1.5
+    },
+    "modelQuality": {
+        "mapq": -1,
+        "fscq": -3,
+        "daq": -1
+    }
+}
+MODIFIED_MODEL_TYPES = ["pdb-redo", "isolde"]
+# 7ey8.deepres.aa.pdb, 7ey8.pdb-redo.mapq.aa.pdb
+REGEX_ANN_FILE = re.compile(
+    r'^(?P<pdb_id>\d\w{3})(\.(?P<modified_model>%s))?\.(?P<algorithm>%s)\.aa\.pdb$' % (
+        "|".join(MODIFIED_MODEL_TYPES),
+        "|".join([algo for family in ANN_TYPES_DICT.values() for algo in family])))
+
+STORE_MEMORY_SIZE = 256
+# files added to an existing entry dir do not change the root dir mtime
+FILE_INDEX_MAX_AGE = 10 * 60
+# rounding of the quantized segment values (float noise of value * step)
+SEGMENT_DECIMALS = 10
+
+
+def getAlgorithmFamily(algoName):
+    for algFamily in ANN_TYPES_DICT:
+        if algoName in ANN_TYPES_DICT[algFamily]:
+            return algFamily
+    return None
+
+
+def getAnnotationRootDir(modifiedPdbType=None):
+    """
+    Directory with one sub-dir per entry containing the annotation files
+    """
+    if modifiedPdbType is None:
+        return EMDB_DATA_DIR
+    return os.path.join(MODIFIED_PDBS_ANN_DIR, modifiedPdbType)
+
+
+def findAnnotationFiles():
+    """
+    Find all annotation files on disk.
+    Yields (path, pdb_id, modified_model, algorithm)
+    """
+    for modifiedPdbType in [None] + MODIFIED_MODEL_TYPES:
+        rootDir = getAnnotationRootDir(modifiedPdbType)
+        if not os.path.isdir(rootDir):
+            continue
+        with os.scandir(rootDir) as dirs:
+            for dirEntry in dirs:
+                if not dirEntry.is_dir():
+                    continue
+                with os.scandir(dirEntry.path) as files:
+                    for fileEntry in files:
+                        matchObj = REGEX_ANN_FILE.match(fileEntry.name)
+                        if matchObj and matchObj.group("modified_model") == modifiedPdbType:
+                            yield (fileEntry.path, matchObj.group("pdb_id"),
+                                   modifiedPdbType, matchObj.group("algorithm"))
+
+
+def getAnnotationFileType(modifiedPdbType=None):
+    """
+    DataFile.fileType (and Entry.entryType) of the annotation files
+    """
+    return ENTRY_TYPES[0] if modifiedPdbType is None else ENTRY_TYPES[1]
+
+
+def getAnnotationFileTypes(modifiedPdbType=None):
+    """
+    DataFile.fileType values the annotation files may be registered with
+    (the files of the modified models used to be registered as ENTRY_TYPES[0])
+    """
+    return list(dict.fromkeys([getAnnotationFileType(modifiedPdbType), ENTRY_TYPES[0]]))
+
+
+def isAnnotationFilePath(dirPath, filename):
+    """
+    Whether the file is an annotation file under one of the annotation root dirs
+    """
+    if not REGEX_ANN_FILE.match(filename):
+        return False
+    return any(os.path.join(dirPath, '').startswith(os.path.join(rootDir, ''))
+               for rootDir in _getIndexedDirs())
+
+
+def _getIndexedDirs():
+    return [getAnnotationRootDir(modifiedPdbType)
+            for modifiedPdbType in [None] + MODIFIED_MODEL_TYPES]
+
+
+def _buildFileIndex():
+    index = {}
+    for path, pdb_id, modified_model, algorithm in findAnnotationFiles():
+        index.setdefault(os.path.basename(path).lower(), path)
+    logger.debug("Annotation file index: %s files", len(index))
+    return index
+
+
+_fileIndex = MtimeCache(_getIndexedDirs(), _buildFileIndex,
+                        maxAge=FILE_INDEX_MAX_AGE, background=True)
+
+
+def findAnnotationFile(filename):
+    """
+    Path of an annotation file from the in-process index, None if not found
+    """
+    return _fileIndex.get().get(filename.lower())
+
+
+@transaction.atomic
+def registerAnnotationFiles():
+    """
+    Add the annotation files found on disk to the Entry/DataFile tables,
+    and remove the records of the annotation files that are not there
+    anymore (only those under the annotation root dirs, the other records
+    are left as they are)
+    """
+    fileTypes = [getAnnotationFileType(modifiedPdbType)
+                 for modifiedPdbType in [None] + MODIFIED_MODEL_TYPES]
+    entries = {(e.entryType, e.path): e for e in Entry.objects.filter(
+        entryType__in=fileTypes)}
+    registered = {(f.path, f.filename): f for f in DataFile.objects.filter(
+        fileType__in=fileTypes).only('unique_id', 'path', 'filename', 'entry')}
+
+    newEntries = []
+    newFiles = []
+    for path, pdb_id, modified_model, algorithm in findAnnotationFiles():
+        dirPath, filename = os.path.split(path)
+        if registered.pop((dirPath, filename), None):
+            continue
+        fileType = getAnnotationFileType(modified_model)
+        entry = entries.get((fileType, dirPath))
+        if entry is None:
+            entry = Entry(entryId=os.path.basename(dirPath)[:10],
+                          path=dirPath, entryType=fileType)
+            entries[(fileType, dirPath)] = entry
+            newEntries.append(entry)
+        newFiles.append((entry, DataFile(filename=filename, path=dirPath,
+                                         fileType=fileType, method=algorithm)))
+
+    Entry.objects.bulk_create(newEntries, batch_size=1000)
+    for entry, dataFile in newFiles:
+        dataFile.entry = entry
+    DataFile.objects.bulk_create([f for e, f in newFiles], batch_size=1000)
+    missing = [f for (dirPath, filename), f in registered.items()
+               if isAnnotationFilePath(dirPath, filename)]
+    if missing:
+        DataFile.objects.filter(unique_id__in=[f.unique_id for f in missing]).delete()
+        # entries left without files by the removal
+        Entry.objects.filter(pk__in={f.entry_id for f in missing},
+                             files__isnull=True).delete()
+    _fileIndex.invalidate()
+    return {"entries": len(newEntries), "added": len(newFiles),
+            "removed": len(missing)}
+
+
+def refreshAnnotationFileIndex():
+    """
+    Build the file index again on its next use
+    """
+    _fileIndex.invalidate()
+
+
+def getAnnotationFilenames(pdb_id, modifiedPdbType=None):
+    """
+    Names of all the annotation files that may exist for a PDB entry
+    """
+    if modifiedPdbType is not None:
+        pdb_id = pdb_id + "." + modifiedPdbType
+    return [ANN_TYPES_DICT[algFamily][algoName] % {"pdb_id": pdb_id}
+            for algFamily in ANN_TYPES_DICT for algoName in ANN_TYPES_DICT[algFamily]]
+
+
+def registerAnnotationFile(path):
+    """
+    Add an annotation file to the Entry/DataFile tables (if not there yet)
+    """
+    dirPath, filename = os.path.split(path)
+    matchObj = REGEX_ANN_FILE.match(filename)
+    if not matchObj:
+        return None
+    fileType = getAnnotationFileType(matchObj.group("modified_model"))
+    with transaction.atomic():
+        dataFile = DataFile.objects.filter(
+            path=dirPath, filename=filename,
+            fileType__in=getAnnotationFileTypes(matchObj.group("modified_model"))).first()
+        if dataFile:
+            return dataFile
+        entry = Entry.objects.filter(entryType=fileType, path=dirPath).first()
+        if entry is None:
+            entry = Entry.objects.create(entryId=os.path.basename(dirPath)[:10],
+                                         path=dirPath, entryType=fileType)
+        return DataFile.objects.create(filename=filename, path=dirPath, entry=entry,
+                                       fileType=fileType,
+                                       method=matchObj.group("algorithm"))
+
+
+def getSegments(residues, values, step=0):
+    """
+    Run-length encode the values of consecutive residues:
+    (begins, ends, values) lists of the runs with the same value, or the same
+    value quantized to step (the quantized value is returned in that case).
+    A gap in the residue numbering always ends a run.
+    """
+    if not len(residues):
+        return [], [], []
+    if step:
+        keys = np.round(values / step).astype(np.int64)
+        segValues = np.round(keys * step, SEGMENT_DECIMALS)
+    else:
+        keys = values
+        segValues = values
+    breaks = np.flatnonzero((np.diff(residues) != 1) | (np.diff(keys) != 0)) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [len(residues)])) - 1
+    return (residues[starts].tolist(), residues[ends].tolist(),
+            segValues[starts].tolist())
+
+
+class AnnotationStore(object):
+    """
+    Residue values of an annotation file, per chain.
+    Chains are contiguous slices (offsets) of the residues/values arrays.
+    """
+
+    def __init__(self, chains, offsets, residues, values, minVals, maxVals):
+        self.chains = chains
+        self.offsets = offsets
+        self.residues = residues
+        self.values = values
+        self.minVals = minVals
+        self.maxVals = maxVals
+        self._chainIdx = {str(chain): idx for idx, chain in enumerate(chains)}
+
+    @classmethod
+    def fromChains(cls, chainsData, minToFilter=-1):
+        chains = list(chainsData.keys())
+        sizes = [len(chainsData[chain][0]) for chain in chains]
+        offsets = np.zeros(len(chains) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(sizes)
+        residues = np.array(
+            [res for chain in chains for res in chainsData[chain][0]], dtype=np.int32)
+        values = np.array(
+            [val for chain in chains for val in chainsData[chain][1]], dtype=np.float64)
+        minVals = np.full(len(chains), np.nan)
+        maxVals = np.full(len(chains), np.nan)
+        for idx in range(len(chains)):
+            chainValues = values[offsets[idx]:offsets[idx + 1]]
+            filtered = chainValues[chainValues > minToFilter]
+            if filtered.size:
+                minVals[idx] = filtered.min()
+            if chainValues.size:
+                maxVals[idx] = chainValues.max()
+        return cls(np.array(chains, dtype='U4'), offsets, residues, values, minVals, maxVals)
+
+    def chainIds(self):
+        return [str(chain) for chain in self.chains]
+
+    def getChain(self, chain_id):
+        """
+        (residues, values, minVal, maxVal) of a chain, None if not in the file
+        """
+        idx = self._chainIdx.get(chain_id)
+        if idx is None:
+            return None
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        minVal = None if np.isnan(self.minVals[idx]) else float(self.minVals[idx])
+        maxVal = None if np.isnan(self.maxVals[idx]) else float(self.maxVals[idx])
+        return self.residues[start:end], self.values[start:end], minVal, maxVal
+
+    def getChainJson(self, chain_id, segments=False, step=0):
+        """
+        Residue values of a chain, one {"begin", "value"} per residue, or with
+        segments consecutive residues with the same value (quantized to step
+        if given) merged in {"begin", "end", "value"} ranges
+        """
+        chainData = self.getChain(chain_id)
+        if chainData is None:
+            return None
+        residues, values, minVal, maxVal = chainData
+        if segments:
+            data = [{"begin": str(begin), "end": str(end), "value": val}
+                    for begin, end, val in zip(*getSegments(residues, values, step))]
+        else:
+            data = [{"begin": str(res), "value": val}
+                    for res, val in zip(residues.tolist(), values.tolist())]
+        return {
+            "chain": chain_id,
+            "data": data,
+            "minVal": minVal,
+            "maxVal": maxVal,
+        }
+
+    def save(self, path, srcPath, srcMtime, minToFilter):
+        """
+        Save the store as .npz (written to a temp file, then moved in place)
+        """
+        dirName = os.path.dirname(path)
+        os.makedirs(dirName, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=dirName, suffix='.tmp', delete=False) as f:
+            np.savez(f,
+                     srcPath=np.array(srcPath),
+                     srcMtime=np.array(srcMtime),
+                     minToFilter=np.array(minToFilter, dtype=np.float64),
+                     chains=self.chains,
+                     offsets=self.offsets,
+                     residues=self.residues,
+                     values=self.values,
+                     minVals=self.minVals,
+                     maxVals=self.maxVals)
+        os.replace(f.name, path)
+
+    @classmethod
+    def load(cls, path, srcPath, srcMtime, minToFilter):
+        """
+        Load a saved store, None if missing or not up to date with the source file
+        """
+        try:
+            with np.load(path) as data:
+                if (str(data["srcPath"]) != srcPath
+                        or float(data["srcMtime"]) != srcMtime
+                        or float(data["minToFilter"]) != float(minToFilter)):
+                    return None
+                return cls(data["chains"], data["offsets"], data["residues"],
+                           data["values"], data["minVals"], data["maxVals"])
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+def parseAnnotationFile(fname, minToFilter=-1):
+    """
+    Read the CA values of all chains in a single pass
+    """
+    chainsData = OrderedDict()
+    with open(fname) as f:
+        for line in f:
+            if not "CA" in line or not "ATOM" in line:
+                continue
+            residues, values = chainsData.setdefault(line[21], ([], []))
+            residues.append(int(line[22:26]))
+            values.append(float(line[54:60]))
+    return AnnotationStore.fromChains(chainsData, minToFilter)
+
+
+def _getStoreCachePath(fname):
+    return os.path.join(ANNOTATIONS_CACHE_DIR, os.path.basename(fname) + '.npz')
+
+
+_stores = OrderedDict()
+_storesLock = threading.Lock()
+
+
+def getAnnotationStore(fname, minToFilter=-1, rebuild=False):
+    """
+    Get the AnnotationStore of an annotation file.
+    Built on first access (or when the source file changed) and then
+    served from memory or from the .npz cache.
+    """
+    srcMtime = os.stat(fname).st_mtime
+    key = (fname, minToFilter)
+    with _storesLock:
+        cached = _stores.get(key)
+        if cached and cached[0] == srcMtime and not rebuild:
+            _stores.move_to_end(key)
+            return cached[1]
+
+    cachePath = _getStoreCachePath(fname)
+    store = None if rebuild else AnnotationStore.load(
+        cachePath, fname, srcMtime, minToFilter)
+    if store is None:
+        logger.debug("Building annotation store for %s", fname)
+        store = parseAnnotationFile(fname, minToFilter)
+        try:
+            store.save(cachePath, fname, srcMtime, minToFilter)
+        except OSError as exc:
+            logger.exception(exc)
+
+    with _storesLock:
+        _stores[key] = (srcMtime, store)
+        _stores.move_to_end(key)
+        while len(_stores) > STORE_MEMORY_SIZE:
+            _stores.popitem(last=False)
+    return store
+
+
+def buildAnnotationStores(rebuild=False):
+    """
+    Build the stores of all annotation files found on disk
+    """
+    count = 0
+    for path, pdb_id, modified_model, algorithm in findAnnotationFiles():
+        minToFilter = ANN_TYPES_MIN_VAL[getAlgorithmFamily(algorithm)][algorithm]
+        try:
+            getAnnotationStore(path, minToFilter, rebuild=rebuild)
+            count += 1
+        except Exception as exc:
+            logger.exception(exc)
+            print("Could not build annotation store for", path, exc)
+    return count
@@ -0,0 +1,80 @@
+"""
+Data available for each PDB entry
+
+PdbEntryAvailability keeps, for each PdbEntry, whether it has PDB-REDO or
+CERES refined models, ligands tested in IDR assays and entities with NMR
+targets. The flags are computed here with one UPDATE per flag and value,
+for the flags that depend on the data domains just updated, when the update
+commands leave updatingDomains (generations.py).
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from .lookups import getRefinedModelSourceId
+from .models import (PdbEntry, PdbEntryAvailability, RefinedModel, LigandEntity, ModelEntity,
+                     DATA_STRUCTURES, DATA_REFINED, DATA_NMR, DATA_IDR)
+
+logger = logging.getLogger(__name__)
+
+AVAILABILITY_FLAGS = ['isPdbRedo', 'isCeres', 'isIdr', 'isNmr']
+# flags computed from the data of each domain (the entries, entities and
+# ligands of DATA_STRUCTURES are used by all of them)
+AVAILABILITY_DOMAINS = {
+    DATA_STRUCTURES: AVAILABILITY_FLAGS,
+    DATA_REFINED: ['isPdbRedo', 'isCeres'],
+    DATA_NMR: ['isNmr'],
+    DATA_IDR: ['isIdr'],
+}
+
+
+def _getRefinedModelCondition(sourceName):
+    sourceId = getRefinedModelSourceId(sourceName)
+    if sourceId is None:
+        # no such source, no entry has its models (source_id=None is IS NULL)
+        return Q(pk__in=[])
+    return Exists(RefinedModel.objects.filter(pdbId=OuterRef('pk'), source_id=sourceId))
+
+
+def getAvailabilityCondition(flag):
+    """
+    Exists() expression (or Q) of the flag for the entry of OuterRef('pk')
+    """
+    if flag == 'isPdbRedo':
+        return _getRefinedModelCondition('PDB-REDO')
+    if flag == 'isCeres':
+        return _getRefinedModelCondition('CERES')
+    if flag == 'isIdr':
+        return Exists(LigandEntity.objects.filter(
+            pdbentry=OuterRef('pk'), well__isnull=False))
+    if flag == 'isNmr':
+        return Exists(ModelEntity.objects.filter(
+            pdbentry=OuterRef('pk'), uniprotAcc__uniprotentities__isnull=False))
+    raise ValueError("Unknown availability flag: %s" % flag)
+
+
+def updateAvailability(*domains):
+    """
+    Compute again the availability flags that depend on the domains,
+    for all the entries (the missing PdbEntryAvailability rows are created).
+    Returns the number of rows created or changed.
+    """
+    flags = [flag for flag in AVAILABILITY_FLAGS
+             if any(flag in AVAILABILITY_DOMAINS.get(domain, []) for domain in domains)]
+    if not flags:
+        return 0
+    with transaction.atomic():
+        changed = len(PdbEntryAvailability.objects.bulk_create(
+            [PdbEntryAvailability(pdbEntry_id=pk) for pk in PdbEntry.objects.filter(
+                availability__isnull=True).values_list('pk', flat=True)],
+            batch_size=1000))
+        for flag in flags:
+            condition = getAvailabilityCondition(flag)
+            added = PdbEntryAvailability.objects.filter(
+                condition, **{flag: False}).update(**{flag: True})
+            removed = PdbEntryAvailability.objects.filter(
+                ~condition, **{flag: True}).update(**{flag: False})
+            logger.info("Availability %s: %s added, %s removed", flag, added, removed)
+            changed += added + removed
+    return changed
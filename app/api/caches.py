@@ -0,0 +1,278 @@
+"""
+Caches for data loaded from files or remote sources
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+REFRESH_WORKERS = 2
+
+
+class MtimeCache(object):
+    """
+    Value loaded from files or directories, loaded again only when
+    the mtime of any of them changes.
+
+        paths: list of paths (or a callable returning it) to watch
+        loader: callable returning the value
+        maxAge: seconds after which the value is loaded again even if
+            no mtime changed (None: never)
+        background: once loaded, reload in a background thread and
+            keep serving the previous value meanwhile
+        checkInterval: seconds between checks of the mtimes (0: every time),
+            for long lists of paths
+    """
+
+    def __init__(self, paths, loader, maxAge=None, background=False, checkInterval=0):
+        self.paths = paths
+        self.loader = loader
+        self.maxAge = maxAge
+        self.background = background
+        self.checkInterval = checkInterval
+        self._checkedAt = 0
+        self._checkedSignature = None
+        self._lock = threading.Lock()
+        self._signature = None
+        self._value = None
+        self._loadedAt = 0
+        self._reloading = False
+
+    def _getSignature(self):
+        now = time.time()
+        if self.checkInterval and now - self._checkedAt < self.checkInterval:
+            return self._checkedSignature
+        paths = self.paths() if callable(self.paths) else self.paths
+        signature = []
+        for path in paths:
+            try:
+                signature.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                signature.append(None)
+        self._checkedSignature = tuple(signature)
+        self._checkedAt = now
+        return self._checkedSignature
+
+    def _load(self, signature):
+        try:
+            value = self.loader()
+            with self._lock:
+                self._value = value
+                self._signature = signature
+                self._loadedAt = time.time()
+        finally:
+            self._reloading = False
+
+    def _isFresh(self, signature):
+        if signature != self._signature:
+            return False
+        return self.maxAge is None or self.age() < self.maxAge
+
+    def get(self):
+        signature = self._getSignature()
+        if self._isFresh(signature):
+            return self._value
+        if self._signature is not None and self.background:
+            if not self._reloading:
+                self._reloading = True
+                threading.Thread(target=self._load, args=(signature,),
+                                 daemon=True).start()
+            return self._value
+        with self._lock:
+            if self._isFresh(signature):
+                return self._value
+            logger.debug("Loading %s", self.paths)
+            value = self.loader()
+            self._value = value
+            self._signature = signature
+            self._loadedAt = time.time()
+            return value
+
+    def age(self):
+        return time.time() - self._loadedAt
+
+    def invalidate(self):
+        with self._lock:
+            self._signature = None
+            self._checkedAt = 0
+
+
+class ContentCache(object):
+    """
+    Disk cache of remote contents (text), one file per key.
+
+        cacheDir: directory of the cache files
+        ttl: seconds a cached content is fresh
+        staleTtl: seconds after `ttl` the content is still served while it is
+            fetched again in the background (stale-while-revalidate)
+
+    Files are written to a temp file and then moved in place, so that
+    readers never see a partial content.
+    """
+
+    _refreshPool = None
+    _refreshing = set()
+    _refreshLock = threading.Lock()
+
+    def __init__(self, cacheDir, ttl, staleTtl=0):
+        self.cacheDir = cacheDir
+        self.ttl = ttl
+        self.staleTtl = staleTtl
+
+    def getPath(self, key):
+        """
+        Path of the cache file of a key
+        """
+        return os.path.join(self.cacheDir, os.path.basename(key))
+
+    def _read(self, path):
+        try:
+            with open(path) as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, key, content):
+        """
+        Save the content of a key
+        """
+        self._write(self.getPath(key), content)
+
+    def _write(self, path, content):
+        os.makedirs(self.cacheDir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(mode='w', dir=self.cacheDir,
+                                         suffix='.tmp', delete=False) as f:
+            f.write(content)
+        os.replace(f.name, path)
+
+    def _fetch(self, key, fetcher):
+        content = fetcher()
+        if content is not None:
+            try:
+                self._write(self.getPath(key), content)
+            except OSError as exc:
+                logger.exception(exc)
+        return content
+
+    def _refresh(self, key, fetcher):
+        try:
+            self._fetch(key, fetcher)
+        except Exception as exc:
+            logger.exception(exc)
+        finally:
+            with self._refreshLock:
+                self._refreshing.discard(self.getPath(key))
+
+    def _refreshInBackground(self, key, fetcher):
+        path = self.getPath(key)
+        with self._refreshLock:
+            if path in self._refreshing:
+                return
+            self._refreshing.add(path)
+            if ContentCache._refreshPool is None:
+                ContentCache._refreshPool = ThreadPoolExecutor(
+                    max_workers=REFRESH_WORKERS, thread_name_prefix='cache-refresh')
+        ContentCache._refreshPool.submit(self._refresh, key, fetcher)
+
+    def prefetch(self, key, fetcher):
+        """
+        Make sure the content for key is on disk and return its path
+        (None if it could not be fetched). It is fetched right away only
+        if missing; once older than `ttl` it is fetched in the background.
+        """
+        path = self.getPath(key)
+        try:
+            age = time.time() - os.stat(path).st_mtime
+        except OSError:
+            try:
+                return path if self._fetch(key, fetcher) is not None else None
+            except Exception as exc:
+                logger.exception(exc)
+                return None
+        if age >= self.ttl:
+            self._refreshInBackground(key, fetcher)
+        return path
+
+    def getFile(self, key, fetcher):
+        """
+        Path of the cache file for key: used as is if fresh (or stale but within
+        staleTtl), otherwise fetched first with fetcher() (returning None means
+        not found, and is not cached). None if not available.
+        """
+        path = self.getPath(key)
+        try:
+            age = time.time() - os.stat(path).st_mtime
+        except OSError:
+            age = None
+        if age is not None:
+            if age < self.ttl:
+                return path
+            if age < self.ttl + self.staleTtl:
+                self._refreshInBackground(key, fetcher)
+                return path
+        try:
+            content = self._fetch(key, fetcher)
+        except Exception as exc:
+            logger.exception(exc)
+            # better an old content than nothing
+            return path if age is not None else None
+        return path if content is not None and os.path.exists(path) else None
+
+    def get(self, key, fetcher):
+        """
+        Content for key, see getFile()
+        """
+        path = self.getFile(key, fetcher)
+        return self._read(path) if path else None
+
+
+# per worker, bounded by the size of the files (parsed data takes several
+# times more memory), larger files are parsed on each call
+JSON_MEMORY_SIZE = 64
+JSON_MEMORY_BYTES = 16 * 1024 * 1024
+_jsonFiles = OrderedDict()
+_jsonFilesBytes = 0
+_jsonFilesLock = threading.Lock()
+
+
+def getFileSignature(path):
+    """
+    (mtime, size) of a file, raises OSError if not found
+    """
+    fstat = os.stat(path)
+    return fstat.st_mtime_ns, fstat.st_size
+
+
+def loadJsonFile(path):
+    """
+    Parsed content of a JSON file, kept in memory (LRU) until the file changes.
+    The returned data is shared, do not modify it.
+    """
+    global _jsonFilesBytes
+    signature = getFileSignature(path)
+    with _jsonFilesLock:
+        cached = _jsonFiles.get(path)
+        if cached and cached[0] == signature:
+            _jsonFiles.move_to_end(path)
+            return cached[1]
+    with open(path) as f:
+        data = json.load(f)
+    size = signature[1]
+    if size > JSON_MEMORY_BYTES:
+        return data
+    with _jsonFilesLock:
+        previous = _jsonFiles.pop(path, None)
+        if previous:
+            _jsonFilesBytes -= previous[0][1]
+        _jsonFiles[path] = (signature, data)
+        _jsonFilesBytes += size
+        while len(_jsonFiles) > JSON_MEMORY_SIZE or _jsonFilesBytes > JSON_MEMORY_BYTES:
+            oldSignature, oldData = _jsonFiles.popitem(last=False)[1]
+            _jsonFilesBytes -= oldSignature[1]
+    return data
@@ -0,0 +1,193 @@
+"""
+DAQ-Score Database (Kihara Lab) client
+
+Chain files are downloaded concurrently (bounded pool, shared HTTP
+connections) and kept in a local content cache, so that the JSON, PDB and
+mmCIF views of an entry are served from disk after the first request.
+
+The list of DAQ entries (entry_ids.txt) is kept in the same cache, parsed
+once into an index by EMDB number and PDB ID shared by all the requests,
+and downloaded again in the background before it gets old.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .caches import ContentCache, MtimeCache
+from .dataPaths import DAQ_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+HTTP_TIMEOUT = 15
+DAQ_DB_URL = "https://daqdb.kiharalab.org"
+# https://daqdb.kiharalab.org/data/aa/js/22458_7jsn_B_v2-0_w9.pdb
+DAQ_CHAIN_URL = DAQ_DB_URL + "/data/aa/%(hash)s/%(filename)s"
+DAQ_ENTRY_LIST_URL = DAQ_DB_URL + "/download/current/entry_ids.txt"
+DAQ_MAX_WORKERS = 6
+# DAQ data is updated weekly
+DAQ_CACHE_TTL = 7 * 86400
+DAQ_CACHE_STALE_TTL = 30 * 86400
+# refresh the entry list well before the chain files get old
+DAQ_ENTRY_LIST_TTL = 86400
+
+_session = None
+_sessionLock = threading.Lock()
+_fetchPool = ThreadPoolExecutor(max_workers=DAQ_MAX_WORKERS,
+                                thread_name_prefix='daq-fetch')
+_chainCache = ContentCache(DAQ_CACHE_DIR, DAQ_CACHE_TTL, DAQ_CACHE_STALE_TTL)
+_entryListCache = ContentCache(DAQ_CACHE_DIR, DAQ_ENTRY_LIST_TTL)
+
+
+def getSession():
+    """
+    HTTP session shared by all the requests to the DAQ DB (keeps connections open)
+    """
+    global _session
+    with _sessionLock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=DAQ_MAX_WORKERS)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def getChainUrl(pdb_id, filename):
+    return DAQ_CHAIN_URL % {"hash": pdb_id[1:3], "filename": filename}
+
+
+def _download(url):
+    resp = getSession().get(url, timeout=HTTP_TIMEOUT)
+    if resp.status_code == 404:
+        logger.debug("Not found %s", url)
+        return None
+    resp.raise_for_status()
+    return resp.text
+
+
+def getChainFile(url):
+    """
+    Content of a DAQ chain file (PDB format), None if not available
+    """
+    try:
+        return _chainCache.get(url, lambda: _download(url))
+    except Exception as exc:
+        logger.exception(exc)
+        return None
+
+
+def getChainFilePath(url):
+    """
+    Path of the local copy of a DAQ chain file, None if not available
+    """
+    try:
+        return _chainCache.getFile(url, lambda: _download(url))
+    except Exception as exc:
+        logger.exception(exc)
+        return None
+
+
+def getChainFilePaths(urls):
+    """
+    Paths of the local copies of several DAQ chain files, in the same
+    order as urls (None for the ones not available)
+    """
+    return list(_fetchPool.map(getChainFilePath, urls))
+
+
+def getChainFiles(urls):
+    """
+    Content of several DAQ chain files, in the same order as urls
+    (None for the ones not available)
+    """
+    return list(_fetchPool.map(getChainFile, urls))
+
+
+def parseEntryName(name):
+    """
+    22458_7jsn_B_v2-0 -> {"name", "emdb": "22458", "pdb": "7jsn", "chain": "B",
+                          "version": "2.0"}, None if malformed
+    """
+    fields = name.split('_')
+    if len(fields) != 4:
+        return None
+    emdb_num, pdb_id, chain_id, version = fields
+    return {
+        "name": name,
+        "emdb": emdb_num,
+        "pdb": pdb_id.lower(),
+        "chain": chain_id,
+        "version": version.replace('v', '').replace('-', '.'),
+    }
+
+
+class DaqEntryIndex(object):
+    """
+    DAQ entries (one per chain and version) by EMDB number and by PDB ID
+    """
+
+    def __init__(self, entries):
+        self.byEmdb = {}
+        self.byPdb = {}
+        for entry in entries:
+            self.byEmdb.setdefault(entry["emdb"], []).append(entry)
+            self.byPdb.setdefault(entry["pdb"], []).append(entry)
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.byEmdb.values())
+
+    def find(self, db_id):
+        """
+        Entries of a DB ID (PDB | EMDB), exact match
+        """
+        db_id = db_id.lower()
+        if db_id.startswith('emd-'):
+            return self.byEmdb.get(db_id[4:], [])
+        return self.byPdb.get(db_id, [])
+
+
+def _downloadEntryList():
+    return _download(DAQ_ENTRY_LIST_URL)
+
+
+def _entryListPath():
+    return _entryListCache.prefetch(DAQ_ENTRY_LIST_URL, _downloadEntryList)
+
+
+def _loadEntryIndex():
+    entries = []
+    try:
+        with open(_entryListCache.getPath(DAQ_ENTRY_LIST_URL)) as f:
+            for line in f:
+                entry = parseEntryName(line.strip())
+                if entry:
+                    entries.append(entry)
+    except OSError as exc:
+        logger.exception(exc)
+    logger.debug("DAQ entry index: %s entries", len(entries))
+    return DaqEntryIndex(entries)
+
+
+_entryIndex = MtimeCache(lambda: [_entryListPath() or ''], _loadEntryIndex,
+                         background=True)
+
+
+def findEntries(db_id):
+    """
+    DAQ entries of a DB ID (PDB | EMDB)
+    """
+    return _entryIndex.get().find(db_id)
+
+
+def updateEntryList():
+    """
+    Download the entry list again, returns the number of entries
+    """
+    content = _downloadEntryList()
+    if content is not None:
+        _entryListCache.put(DAQ_ENTRY_LIST_URL, content)
+    _entryIndex.invalidate()
+    return len(_entryIndex.get())
@@ -13,6 +13,12 @@ EMDB_DATA_DIR = os.path.join(PATH_DATA, EMDB_BASEDIR)
 EMV_BASEDIR = 'emv'
 EMV_DATA_DIR = os.path.join(PATH_DATA, EMV_BASEDIR)
 
+QSCORE_BASEDIR = 'q-score'
+QSCORE_DATA_DIR = os.path.join(PATH_DATA, QSCORE_BASEDIR)
+
+DAQ_BASEDIR = 'daq'
+DAQ_DATA_DIR = os.path.join(PATH_DATA, DAQ_BASEDIR)
+
 FUNPDBE_BASEDIR = "funpdbe"
 FUNPDBE_DATA_PATH = os.path.join(PATH_DATA, FUNPDBE_BASEDIR)
 
@@ -28,6 +34,12 @@ COMPUT_MODELS_DIR = os.path.join(PATH_DATA, COMPUT_MODELS_BASEDIR)
 MODEL_AND_LIGAND_BASEDIR = "ligandModels/"
 MODEL_AND_LIGAND_DIR = os.path.join(PATH_DATA, MODEL_AND_LIGAND_BASEDIR)
 
+# Data derived from the data files, can be safely removed at any time
+CACHE_BASEDIR = "cache"
+CACHE_DATA_DIR = os.path.join(PATH_DATA, CACHE_BASEDIR)
+ANNOTATIONS_CACHE_DIR = os.path.join(CACHE_DATA_DIR, "annotations")
+DAQ_CACHE_DIR = os.path.join(CACHE_DATA_DIR, "daq")
+
 BIONOTES_URL = "https://3dbionotes.cnb.csic.es"
 MAPPINGS_WS_PATH = "api/mappings"
 EMV_WS_URL = "http://finlay.cnb.csic.es:8010"
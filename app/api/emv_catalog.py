@@ -0,0 +1,240 @@
+"""
+EMV data-file catalog
+
+Index of the EMV data files (JSON, PDB, mmCIF) available under the data
+directories, so that the API resolves them with an indexed DB lookup instead
+of globbing the disk on every request.
+
+The catalog is built and refreshed by the `update_emv_catalog` command.
+Only directories whose mtime changed since the last run are scanned again.
+"""
+import logging
+import os
+import re
+
+from django.db import transaction
+from django.db.models import Q
+
+from .dataPaths import EMDB_DATA_DIR, EMV_DATA_DIR, QSCORE_DATA_DIR, DAQ_DATA_DIR
+from .models import EmvCatalogDir, EmvDataFile
+
+logger = logging.getLogger(__name__)
+
+# emd-31319_7ey8_emv_mapq.json, emd-31319_emv_stats.json
+REGEX_EMV_JSON_FILE = re.compile(
+    r'^(?P<emdb>emd-\d{4,5})(_(?P<pdb>\d[a-z0-9]{3}))?_emv_(?P<method>[\w-]+)\.json$')
+# emd_26003_7tmw_emv_mapq.json
+REGEX_QSCORE_JSON_FILE = re.compile(
+    r'^emd_(?P<emdb>\d{4,5})_(?P<pdb>\d[a-z0-9]{3})_emv_(?P<method>mapq)\.json$')
+# emd_26003_pdb_7tmw.cif
+REGEX_QSCORE_CIF_FILE = re.compile(
+    r'^emd_(?P<emdb>\d{4,5})_pdb_(?P<pdb>\d[a-z0-9]{3})\.cif$')
+# emd-23530_7lv9_emv_daq.json
+REGEX_DAQ_JSON_FILE = re.compile(
+    r'^(?P<emdb>emd-\d{4,5})_(?P<pdb>\d[a-z0-9]{3})_emv_(?P<method>daq)\.json$')
+# 15086_8a1s_B_v1-2_w9.pdb
+REGEX_DAQ_PDB_FILE = re.compile(
+    r'^(?P<emdb>\d{4,5})_(?P<pdb>\d[a-z0-9]{3})_\w{1,4}_v\d+-\d+_w\d+\.pdb$')
+
+# Where the EMV data files are, and how they are named
+#   maxDepth: sub-directory levels to look into (None: no limit)
+CATALOG_SOURCES = [
+    {
+        # EMV data, one dir per EMDB entry: /data/emv/emd-*/
+        "name": "emv",
+        "root": EMV_DATA_DIR,
+        "maxDepth": 1,
+        "fileFormat": "json",
+        "regex": REGEX_EMV_JSON_FILE,
+    },
+    {
+        # EMV local resolution data: /data/emdbs/emd-*/
+        "name": "emdb",
+        "root": EMDB_DATA_DIR,
+        "maxDepth": 1,
+        "fileFormat": "json",
+        "regex": REGEX_EMV_JSON_FILE,
+    },
+    {
+        # reformated data from Grigore Pintilie
+        "name": "mapq",
+        "root": os.path.join(QSCORE_DATA_DIR, 'json'),
+        "maxDepth": 0,
+        "fileFormat": "json",
+        "regex": REGEX_QSCORE_JSON_FILE,
+    },
+    {
+        # original data from Grigore Pintilie
+        "name": "mapq",
+        "root": os.path.join(QSCORE_DATA_DIR, 'emdb_qscores'),
+        "maxDepth": 0,
+        "fileFormat": "mmcif",
+        "method": "mapq",
+        "regex": REGEX_QSCORE_CIF_FILE,
+    },
+    {
+        # reformated data from Kihara Lab
+        "name": "daq",
+        "root": os.path.join(DAQ_DATA_DIR, 'json'),
+        "maxDepth": None,
+        "fileFormat": "json",
+        "regex": REGEX_DAQ_JSON_FILE,
+    },
+    {
+        # original data from Kihara Lab
+        "name": "daq",
+        "root": os.path.join(DAQ_DATA_DIR, 'data_20230426'),
+        "maxDepth": None,
+        "fileFormat": "pdb",
+        "method": "daq",
+        "regex": REGEX_DAQ_PDB_FILE,
+    },
+]
+
+
+def _normalizeEmdbId(emdb_id):
+    emdb_id = emdb_id.lower()
+    if not emdb_id.startswith('emd-'):
+        emdb_id = 'emd-' + emdb_id
+    return emdb_id
+
+
+def parseEmvFilename(source, filename):
+    """
+    Get the (emdbId, pdbId, method) of a data file, or None if the
+    filename does not match the naming of the source
+    """
+    matchObj = source["regex"].match(filename)
+    if not matchObj:
+        return None
+    fields = matchObj.groupdict()
+    return (_normalizeEmdbId(fields["emdb"]),
+            fields.get("pdb") or '',
+            fields.get("method") or source.get("method", ''))
+
+
+def getEmvCatalogFiles(source, db_id=None, method=None, fileFormat=None):
+    """
+    Get the catalog entries for a source, optionally filtered by
+    DB ID (PDB | EMDB), method and file format
+    """
+    queryset = EmvDataFile.objects.filter(source=source)
+    if db_id:
+        db_id = db_id.lower()
+        if db_id.startswith('emd-'):
+            queryset = queryset.filter(emdbId=db_id)
+        else:
+            queryset = queryset.filter(pdbId=db_id)
+    if method:
+        queryset = queryset.filter(method=method)
+    if fileFormat:
+        queryset = queryset.filter(fileFormat=fileFormat)
+    return queryset.order_by('filename')
+
+
+def updateEmvCatalog(full=False):
+    """
+    Refresh the catalog from disk.
+    A directory is scanned only if its mtime changed since the last update,
+    unless `full` is set.
+    """
+    stats = {"dirs": 0, "scanned": 0, "added": 0,
+             "updated": 0, "removed": 0, "removedDirs": 0}
+    for source in CATALOG_SOURCES:
+        _updateCatalogSource(source, full, stats)
+    logger.info("EMV catalog updated: %s", stats)
+    return stats
+
+
+def _updateCatalogSource(source, full, stats):
+    root = source["root"]
+    logger.debug("Updating EMV catalog %s: %s", source["name"], root)
+    # the root and the dirs under it (not siblings with the same prefix)
+    knownDirs = {d.path: d for d in EmvCatalogDir.objects.filter(
+        Q(path=root) | Q(path__startswith=os.path.join(root, '')),
+        source=source["name"])}
+    childDirs = {}
+    for path in knownDirs:
+        childDirs.setdefault(os.path.dirname(path), []).append(path)
+
+    visited = set()
+    pending = [(root, 0)]
+    while pending:
+        path, depth = pending.pop()
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            continue
+        visited.add(path)
+        stats["dirs"] += 1
+        dirRecord = knownDirs.get(path)
+        canDescend = source["maxDepth"] is None or depth < source["maxDepth"]
+        if dirRecord and dirRecord.mtime == mtime and not full:
+            # nothing added or removed here, but check the sub-dirs
+            subdirs = childDirs.get(path, []) if canDescend else []
+        else:
+            subdirs = _scanCatalogDir(
+                source, path, mtime, dirRecord, canDescend, stats)
+        for subdir in subdirs:
+            pending.append((subdir, depth + 1))
+
+    # drop dirs that are not there anymore (and their files)
+    removed = [d.id for path, d in knownDirs.items() if path not in visited]
+    if removed:
+        EmvCatalogDir.objects.filter(id__in=removed).delete()
+        stats["removedDirs"] += len(removed)
+
+
+@transaction.atomic
+def _scanCatalogDir(source, path, mtime, dirRecord, canDescend, stats):
+    subdirs = []
+    found = {}
+    stats["scanned"] += 1
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir():
+                if canDescend:
+                    subdirs.append(entry.path)
+                continue
+            fileIds = parseEmvFilename(source, entry.name)
+            if fileIds and entry.is_file():
+                found[entry.name] = (fileIds, entry.stat())
+
+    if dirRecord is None:
+        dirRecord = EmvCatalogDir.objects.create(
+            source=source["name"], path=path, mtime=mtime)
+    else:
+        dirRecord.mtime = mtime
+        dirRecord.save(update_fields=['mtime'])
+
+    existing = {f.filename: f for f in dirRecord.files.all()}
+    toCreate = []
+    toUpdate = []
+    for filename, ((emdbId, pdbId, method), fstat) in found.items():
+        dataFile = existing.pop(filename, None)
+        if dataFile is None:
+            toCreate.append(EmvDataFile(
+                directory=dirRecord,
+                source=source["name"],
+                emdbId=emdbId,
+                pdbId=pdbId,
+                method=method,
+                fileFormat=source["fileFormat"],
+                filename=filename,
+                path=os.path.join(path, filename),
+                mtime=fstat.st_mtime,
+                size=fstat.st_size))
+        elif dataFile.mtime != fstat.st_mtime or dataFile.size != fstat.st_size:
+            dataFile.mtime = fstat.st_mtime
+            dataFile.size = fstat.st_size
+            toUpdate.append(dataFile)
+    EmvDataFile.objects.bulk_create(toCreate, batch_size=1000)
+    EmvDataFile.objects.bulk_update(
+        toUpdate, ['mtime', 'size'], batch_size=1000)
+    if existing:
+        EmvDataFile.objects.filter(
+            id__in=[f.id for f in existing.values()]).delete()
+    stats["added"] += len(toCreate)
+    stats["updated"] += len(toUpdate)
+    stats["removed"] += len(existing)
+    return subdirs
@@ -0,0 +1,183 @@
+"""
+EMV computation jobs
+
+When no map derived annotation is found for a PDB chain, /pdbAnnotFromMap/
+queues an EmvJob (once) and answers 202 with the job status URL. The
+`run_emv_jobs` worker requests the computation to the EMV WebService, with
+bounded concurrency, and then waits for the annotation files to land on
+disk to register them in DataFile.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.db import IntegrityError, close_old_connections, connection
+from django.utils import timezone
+
+from .annotations import getAnnotationFilenames, findAnnotationFile, \
+    refreshAnnotationFileIndex, registerAnnotationFile
+from .dataPaths import EMV_WS_URL, EMV_WS_PATH
+from .models import EmvJob, JOB_QUEUED, JOB_RUNNING, JOB_SUBMITTED, JOB_DONE, JOB_FAILED
+
+logger = logging.getLogger(__name__)
+
+HTTP_TIMEOUT = 30
+MAX_ATTEMPTS = 3
+# failed jobs are queued again after this time
+RETRY_AFTER = timedelta(days=1)
+# submitted jobs without results after this time are failed
+RESULTS_TIMEOUT = timedelta(days=2)
+DEFAULT_WORKERS = 4
+
+
+def requestEmvJob(pdb_id, chain_id, modified_model=None):
+    """
+    Get the job computing the annotations of a PDB chain, queued if new
+    (or if it failed long ago)
+    """
+    fields = {"pdbId": pdb_id.lower(), "chainId": chain_id,
+              "modifiedModel": modified_model or ''}
+    try:
+        job, created = EmvJob.objects.get_or_create(**fields)
+    except IntegrityError:
+        # queued at the same time by another request
+        job = EmvJob.objects.get(**fields)
+    if job.status == JOB_FAILED and job.finished and \
+            job.finished < timezone.now() - RETRY_AFTER:
+        EmvJob.objects.filter(pk=job.pk, status=JOB_FAILED).update(
+            status=JOB_QUEUED, attempts=0, detail='', finished=None,
+            updated=timezone.now())
+        job.refresh_from_db()
+    return job
+
+
+def _getJobQueryPath(job):
+    pdb_id = job.pdbId
+    if job.modifiedModel:
+        pdb_id = pdb_id + "." + job.modifiedModel
+    return EMV_WS_URL + "/" + EMV_WS_PATH + "/" + pdb_id + "/" + job.chainId + "/"
+
+
+def _finishJob(job, status, detail=''):
+    job.status = status
+    job.detail = detail[:255]
+    job.finished = timezone.now()
+    job.save(update_fields=['status', 'detail', 'finished', 'updated'])
+
+
+def submitJob(job):
+    """
+    Request the computation to the EMV WebService
+    (asynchronous, the results are written to the data dirs)
+    """
+    close_old_connections()
+    q_path = _getJobQueryPath(job)
+    logger.debug("Requesting EMV WebService to calculate the EMV scores %s", q_path)
+    job.attempts += 1
+    try:
+        headers = {'accept': 'application/json'}
+        resp = requests.get(q_path, headers=headers, timeout=(2, HTTP_TIMEOUT))
+        logger.debug("WS-response: %s", resp.status_code)
+        if resp.status_code < 400:
+            job.status = JOB_SUBMITTED
+            job.submitted = timezone.now()
+            job.save(update_fields=['status', 'submitted', 'attempts', 'updated'])
+            return job
+        detail = "EMV WebService answered %s" % resp.status_code
+    except Exception as exc:
+        logger.exception(exc)
+        detail = str(exc)
+
+    if job.attempts >= MAX_ATTEMPTS:
+        job.save(update_fields=['attempts'])
+        _finishJob(job, JOB_FAILED, detail)
+    else:
+        job.status = JOB_QUEUED
+        job.detail = detail[:255]
+        job.save(update_fields=['status', 'detail', 'attempts', 'updated'])
+    return job
+
+
+def _submitJobInThread(job):
+    try:
+        return submitJob(job)
+    finally:
+        # each worker thread has its own DB connection
+        connection.close()
+
+
+def collectJobResults(job):
+    """
+    Register the annotation files of a submitted job, if they are on disk
+    """
+    found = []
+    modified_model = job.modifiedModel or None
+    for filename in getAnnotationFilenames(job.pdbId, modified_model):
+        path = findAnnotationFile(filename)
+        if path:
+            registerAnnotationFile(path)
+            found.append(filename)
+    if found:
+        _finishJob(job, JOB_DONE, "%s annotation files" % len(found))
+    elif job.submitted and job.submitted < timezone.now() - RESULTS_TIMEOUT:
+        _finishJob(job, JOB_FAILED, "No results from the EMV WebService")
+    return job
+
+
+def _claimQueuedJobs(limit):
+    jobs = []
+    for job in EmvJob.objects.filter(status=JOB_QUEUED).order_by('created')[:limit]:
+        # another worker may have taken it
+        if EmvJob.objects.filter(pk=job.pk, status=JOB_QUEUED).update(
+                status=JOB_RUNNING, updated=timezone.now()):
+            job.status = JOB_RUNNING
+            jobs.append(job)
+    return jobs
+
+
+def runEmvJobs(workers=DEFAULT_WORKERS, batchSize=100):
+    """
+    One pass of the worker: submit the queued jobs (at most `workers` at a
+    time) and collect the results of the submitted ones
+    """
+    stats = {"submitted": 0, "done": 0, "failed": 0}
+    jobs = _claimQueuedJobs(batchSize)
+    if jobs:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for job in executor.map(_submitJobInThread, jobs):
+                if job.status == JOB_SUBMITTED:
+                    stats["submitted"] += 1
+                elif job.status == JOB_FAILED:
+                    stats["failed"] += 1
+
+    submitted = list(EmvJob.objects.filter(status=JOB_SUBMITTED))
+    if submitted:
+        refreshAnnotationFileIndex()
+        for job in submitted:
+            collectJobResults(job)
+            if job.status == JOB_DONE:
+                stats["done"] += 1
+            elif job.status == JOB_FAILED:
+                stats["failed"] += 1
+    return stats
+
+
+def requeueStaleJobs(olderThan=timedelta(hours=1)):
+    """
+    Jobs left running by a worker that died go back to the queue
+    """
+    return EmvJob.objects.filter(
+        status=JOB_RUNNING, updated__lt=timezone.now() - olderThan).update(
+        status=JOB_QUEUED, updated=timezone.now())
+
+
+def runEmvWorker(workers=DEFAULT_WORKERS, interval=60, once=False):
+    requeueStaleJobs()
+    while True:
+        stats = runEmvJobs(workers)
+        logger.info("EMV jobs: %s", stats)
+        if once:
+            return stats
+        time.sleep(interval)
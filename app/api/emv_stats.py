@@ -0,0 +1,123 @@
+"""
+EMV statistics tables
+
+Tables read by the EMV end-points (Q-score averages, local resolution
+distribution) are loaded once into memory and loaded again only when their
+file changes on disk.
+"""
+import csv
+import logging
+import os
+
+import numpy as np
+
+from .caches import MtimeCache
+from .dataPaths import QSCORE_DATA_DIR, EMDB_DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+QSCORE_AVERAGES_FILE = os.path.join(QSCORE_DATA_DIR, "emd_qscores.txt")
+LOCALRES_HISTORY_FILE = os.path.join(
+    EMDB_DATA_DIR, 'statistics', 'emv_localResolution_stats.csv')
+
+
+def _loadQScoreAverages():
+    """
+    Read emd_qscores.txt (<emdb>\\t<pdb>\\t<avg Q-score>\\t<est. resolution>)
+    into a dict keyed by both the EMDB ID (emd-NNNNN) and the PDB ID.
+    On repeated IDs, the first row wins.
+    """
+    averages = {}
+    with open(QSCORE_AVERAGES_FILE) as csv_file:
+        csv_reader = csv.reader(csv_file, delimiter='\t')
+        for row in csv_reader:
+            try:
+                emdbNum = row[0].lower().replace('emd_', '')
+                item = {
+                    "volumeMap": "EMD-%s" % emdbNum,
+                    "atomicModel": row[1],
+                    "averageQScore": float(row[2]),
+                    "estimatedResolution": float(row[3]),
+                }
+            except (IndexError, ValueError):
+                continue
+            averages.setdefault("emd-" + emdbNum, item)
+            averages.setdefault(row[1].lower(), item)
+    logger.debug("Q-score averages: %s entries", len(averages))
+    return averages
+
+
+_qscoreAverages = MtimeCache([QSCORE_AVERAGES_FILE], _loadQScoreAverages)
+
+
+def getQScoreAveragesDate():
+    """
+    Processing date of the Q-score averages (file mtime)
+    """
+    return os.path.getmtime(QSCORE_AVERAGES_FILE)
+
+
+def getQScoreAverages(db_id):
+    """
+    Average Q-score and estimated resolution of an entry by DB ID (PDB | EMDB),
+    None if not found
+    """
+    db_id = db_id.lower()
+    if db_id.startswith('emd_'):
+        db_id = 'emd-' + db_id[4:]
+    return _qscoreAverages.get().get(db_id)
+
+
+def _loadLocalResDistribution():
+    """
+    Read the consensus resolution (2nd column) of all entries
+    in emv_localResolution_stats.csv as a sorted array
+    """
+    resolutions = []
+    with open(LOCALRES_HISTORY_FILE) as csv_file:
+        csv_reader = csv.reader(csv_file, delimiter='\t')
+        for row in csv_reader:
+            try:
+                resolutions.append(float(row[1]))
+            except (IndexError, ValueError):
+                continue
+    if not resolutions:
+        raise ValueError("No resolutions in %s" % LOCALRES_HISTORY_FILE)
+    return np.sort(np.array(resolutions, dtype=np.float64))
+
+
+_localResDistribution = MtimeCache(
+    [LOCALRES_HISTORY_FILE], _loadLocalResDistribution)
+
+
+def getLocalResRanks(resolutions):
+    """
+    Rank (0-100) of each resolution respect all entries in the local resolution
+    stats: percentage of entries with a resolution lower or equal to it
+    """
+    distribution = _localResDistribution.get()
+    positions = np.searchsorted(
+        distribution, np.asarray(resolutions, dtype=np.float64), side='right')
+    return (positions * 100 // distribution.size).tolist()
+
+
+def getLocalResRank(resolution):
+    return getLocalResRanks([resolution])[0]
+
+
+def getLocalResHistogram(bins=20, minVal=None, maxVal=None):
+    """
+    Distribution of the local resolution stats, as counts per bin
+    """
+    distribution = _localResDistribution.get()
+    rangeMin = distribution[0] if minVal is None else minVal
+    rangeMax = distribution[-1] if maxVal is None else maxVal
+    counts, edges = np.histogram(distribution, bins=bins, range=(rangeMin, rangeMax))
+    return {
+        "total": int(distribution.size),
+        "min": float(distribution[0]),
+        "max": float(distribution[-1]),
+        "median": float(np.median(distribution)),
+        "edges": edges.tolist(),
+        "counts": counts.tolist(),
+    }
@@ -0,0 +1,91 @@
+"""
+Index of the FunPDBe files
+
+Built once by walking FUNPDBE_DATA_PATH (<hash>/<pdb_id>...json) and built
+again when any directory of the tree changes (checked once a minute).
+"""
+import logging
+import os
+from bisect import bisect_left
+
+from .caches import MtimeCache
+from .dataPaths import FUNPDBE_DATA_PATH
+
+logger = logging.getLogger(__name__)
+
+CHECK_INTERVAL = 60
+
+
+class FunPDBeIndex(object):
+    """
+    FunPDBe files sorted by filename, and by PDB ID
+    """
+
+    def __init__(self, files):
+        # sorted by key, which bisect and the cursors rely on ('x.json|...'
+        # sorts after 'x.json.gz|...', not so the (filename, path) tuples)
+        files = sorted(files, key=lambda file: self.getKey(*file))
+        self.keys = [self.getKey(filename, path) for filename, path in files]
+        self.entries = [{
+            "entry": {
+                "pdb": self.getPdbId(filename),
+                "filename": filename
+            }
+        } for filename, path in files]
+        self.byPdb = {}
+        for filename, path in files:
+            self.byPdb.setdefault(self.getPdbId(filename), []).append((filename, path))
+
+    @staticmethod
+    def getKey(filename, path):
+        return filename + '|' + path
+
+    @staticmethod
+    def getPdbId(filename):
+        return os.path.basename(filename).split(".", 1)[0][:4]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def getPrefixRange(self, prefix):
+        """
+        (start, end) of the entries with a filename starting by prefix
+        """
+        if not prefix:
+            return 0, len(self.keys)
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + '\uffff', start)
+        return start, end
+
+    def getFiles(self, pdb_id):
+        """
+        (filename, path) of the files of a PDB entry
+        """
+        return self.byPdb.get(pdb_id, [])
+
+
+def _getTreeDirs():
+    dirs = [FUNPDBE_DATA_PATH]
+    try:
+        with os.scandir(FUNPDBE_DATA_PATH) as it:
+            dirs += sorted(entry.path for entry in it if entry.is_dir())
+    except OSError:
+        pass
+    return dirs
+
+
+def _buildIndex():
+    files = []
+    logger.debug("Reading data folder: %s", FUNPDBE_DATA_PATH)
+    for root, dirs, data_files in os.walk(FUNPDBE_DATA_PATH):
+        for filename in data_files:
+            files.append((filename, os.path.join(root, filename)))
+    logger.debug("FunPDBe index: %s files", len(files))
+    return FunPDBeIndex(files)
+
+
+_index = MtimeCache(_getTreeDirs, _buildIndex, checkInterval=CHECK_INTERVAL)
+
+
+def getFunPDBeIndex():
+    return _index.get()
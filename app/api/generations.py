@@ -0,0 +1,100 @@
+"""
+Data generations
+
+Each data domain (models.DATA_DOMAINS) has a counter in DataGeneration that
+the update commands bump once their changes are committed. Anything derived
+from the DB (cached responses, ETags) is keyed by the generations of the
+domains it depends on, so it is valid until one of them changes. The data
+denormalized from several domains (availability.py) is computed again at the
+same time.
+
+Workers read the counters from the DB at most once every CHECK_INTERVAL seconds.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DataGeneration
+
+logger = logging.getLogger(__name__)
+
+CHECK_INTERVAL = 5
+
+_generations = {}
+_checked = 0
+_lock = threading.Lock()
+
+
+def getGenerations():
+    """
+    {domain: generation} of all the domains updated at least once
+    """
+    global _generations, _checked
+    with _lock:
+        if time.monotonic() - _checked < CHECK_INTERVAL:
+            return _generations
+    generations = dict(DataGeneration.objects.values_list('domain', 'generation'))
+    with _lock:
+        _generations = generations
+        _checked = time.monotonic()
+    return generations
+
+
+def getGeneration(domain):
+    return getGenerations().get(domain, 0)
+
+
+def getGenerationTag(domains):
+    """
+    'structures.12-idr.3' for the domains, to be used in keys and ETags
+    """
+    generations = getGenerations()
+    return "-".join("%s.%s" % (domain, generations.get(domain, 0)) for domain in domains)
+
+
+def invalidate():
+    """
+    Read the counters from the DB on the next call
+    """
+    global _checked
+    with _lock:
+        _checked = 0
+
+
+def bumpGeneration(*domains):
+    """
+    Bump the generation of the domains when the current transaction commits
+    (at once if there is none)
+    """
+    def bump():
+        for domain in domains:
+            DataGeneration.objects.get_or_create(domain=domain)
+            DataGeneration.objects.filter(domain=domain).update(
+                generation=F('generation') + 1, updated=timezone.now())
+            logger.info("Data generation of %s bumped", domain)
+        invalidate()
+    transaction.on_commit(bump)
+
+
+@contextmanager
+def updatingDomains(*domains):
+    """
+    Update the entries availability and bump the generation of the domains
+    after the block, even if it failed (some of its changes may have been
+    committed)
+    """
+    # availability imports this module
+    from .availability import updateAvailability
+
+    try:
+        yield
+    finally:
+        try:
+            updateAvailability(*domains)
+        finally:
+            bumpGeneration(*domains)
@@ -0,0 +1,175 @@
+"""
+IDR evidence of the ligands
+
+The FeatureType -> Assay -> Screen -> Plate -> Well tree of the wells where
+some ligands were tested is fetched with one joined query (plus one query per
+many to many relation serialized, and one for the additional analyses) and
+grouped in memory, instead of querying each level for each parent object.
+Used by LigandEntitySerializer.imageData, for all the ligands of a page at once.
+
+The control wells of all the plates in the trees are fetched with one more
+query, and kept serialized in memory until the IDR data generation changes.
+"""
+import logging
+import threading
+from collections import OrderedDict
+
+from django.db.models import Prefetch
+
+from .generations import getGeneration
+from .models import WellEntity, Analyses, Publication, DATA_IDR
+
+logger = logging.getLogger(__name__)
+
+CONTROL_TYPES = ['positive', 'negative']
+CONTROL_WELLS_CACHE_SIZE = 4096
+
+_controlWells = OrderedDict()
+_controlWellsLock = threading.Lock()
+
+
+def getControlWells(plateIds):
+    """
+    {plate ID: serialized control wells} of the plates.
+    The serialized wells are shared, they must not be modified.
+    """
+    # serializers imports this module
+    from .serializers import WellEntitySerializer
+
+    generation = getGeneration(DATA_IDR)
+    controlWells = {}
+    missing = []
+    with _controlWellsLock:
+        for plateId in set(plateIds):
+            key = (generation, plateId)
+            if key in _controlWells:
+                _controlWells.move_to_end(key)
+                controlWells[plateId] = _controlWells[key]
+            else:
+                missing.append(plateId)
+    if not missing:
+        return controlWells
+
+    wellsByPlate = {plateId: [] for plateId in missing}
+    for well in WellEntity.objects.filter(
+            plate_id__in=missing, controlType__in=CONTROL_TYPES).order_by('plate_id', 'pk'):
+        wellsByPlate[well.plate_id].append(well)
+    with _controlWellsLock:
+        for plateId, wells in wellsByPlate.items():
+            data = WellEntitySerializer(many=True).to_representation(wells)
+            controlWells[plateId] = data
+            _controlWells[(generation, plateId)] = data
+        while len(_controlWells) > CONTROL_WELLS_CACHE_SIZE:
+            _controlWells.popitem(last=False)
+    return controlWells
+
+
+class LigandEvidence(object):
+    """
+    IDR evidence tree of a ligand
+    """
+
+    def __init__(self, parent):
+        self.parent = parent
+        # (level, parent pk) -> {pk: object}, in insertion order
+        self._children = {}
+        self._analyses = {}
+
+    def _add(self, level, parent, obj):
+        self._children.setdefault((level, parent), {}).setdefault(obj.pk, obj)
+
+    def addWell(self, well):
+        plate = well.plate
+        screen = plate.screen
+        assay = screen.assay
+        featureType = assay.featureType
+        self._add('featureType', None, featureType)
+        self._add('assay', featureType.pk, assay)
+        self._add('screen', assay.pk, screen)
+        self._add('plate', screen.pk, plate)
+        self._add('well', plate.pk, well)
+
+    def addAnalyses(self, analyses):
+        self._analyses.setdefault(analyses.assay_id, []).append(analyses)
+
+    def _get(self, level, parent):
+        children = self._children.get((level, parent), {})
+        return [children[pk] for pk in sorted(children)]
+
+    def getFeatureTypes(self):
+        return self._get('featureType', None)
+
+    def getAssays(self, featureType):
+        return self._get('assay', featureType.pk)
+
+    def getScreens(self, assay):
+        return self._get('screen', assay.pk)
+
+    def getPlates(self, screen):
+        return self._get('plate', screen.pk)
+
+    def getWells(self, plate):
+        # sorted by name when fetched
+        return list(self._children.get(('well', plate.pk), {}).values())
+
+    def getAnalyses(self, assay):
+        return self._analyses.get(assay.pk, [])
+
+    def getControlWells(self, plate):
+        return self.parent.getControlWells(plate)
+
+
+class IDREvidence(object):
+    """
+    IDR evidence trees of several ligands
+    """
+
+    def __init__(self, ligandIds):
+        self.ligands = {ligandId: LigandEvidence(self) for ligandId in ligandIds}
+        self.plateIds = set()
+        self.controlWells = None
+
+    def __contains__(self, ligandId):
+        return ligandId in self.ligands
+
+    def getLigand(self, ligandId):
+        return self.ligands[ligandId]
+
+    def getControlWells(self, plate):
+        # of all the plates, on the first one
+        if self.controlWells is None:
+            self.controlWells = getControlWells(self.plateIds)
+        return self.controlWells.get(plate.pk, [])
+
+
+def getIDREvidence(ligandIds):
+    """
+    IDREvidence of the ligands (IUPACInChIkey)
+    """
+    ligandIds = list(set(ligandIds))
+    evidence = IDREvidence(ligandIds)
+    wells = WellEntity.objects.filter(
+        ligand_id__in=ligandIds,
+        plate__screen__assay__featureType__isnull=False,
+    ).select_related(
+        'plate__screen__assay__featureType'
+    ).prefetch_related(
+        'plate__screen__screenTypes',
+        'plate__screen__technologyTypes',
+        'plate__screen__imagingMethods',
+        'plate__screen__assay__assayTypes',
+        'plate__screen__assay__organisms',
+        Prefetch('plate__screen__assay__publications',
+                 queryset=Publication.objects.prefetch_related('authors')),
+    ).order_by('name')
+    assayIds = set()
+    for well in wells:
+        evidence.getLigand(well.ligand_id).addWell(well)
+        evidence.plateIds.add(well.plate_id)
+        assayIds.add(well.plate.screen.assay_id)
+
+    if assayIds:
+        for analyses in Analyses.objects.filter(
+                ligand_id__in=ligandIds, assay_id__in=assayIds).order_by('pk'):
+            evidence.getLigand(analyses.ligand_id).addAnalyses(analyses)
+    return evidence
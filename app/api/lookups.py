@@ -0,0 +1,52 @@
+"""
+Static lookup rows
+
+The refined model sources and methods are only changed by the init and
+update commands, so their IDs are kept in memory by name instead of being
+read from the DB on each request. They are read again when the generation
+of the refined models changes.
+"""
+import logging
+import threading
+
+from .generations import getGeneration
+from .models import RefinedModelSource, RefinedModelMethod, DATA_REFINED
+
+logger = logging.getLogger(__name__)
+
+_lookups = {}
+_generation = None
+_lock = threading.Lock()
+
+
+def _getLookup(model):
+    """
+    {lowercase name: ID} of the rows of the model
+    """
+    global _lookups, _generation
+    generation = getGeneration(DATA_REFINED)
+    with _lock:
+        if generation != _generation:
+            _lookups = {}
+            _generation = generation
+        if model in _lookups:
+            return _lookups[model]
+    lookup = {name.lower(): pk for pk, name in model.objects.values_list('pk', 'name')}
+    with _lock:
+        if generation == _generation:
+            _lookups[model] = lookup
+    return lookup
+
+
+def getRefinedModelSourceId(name):
+    """
+    ID of the RefinedModelSource (case insensitive), None if there is none
+    """
+    return _getLookup(RefinedModelSource).get(name.lower())
+
+
+def getRefinedModelMethodId(name):
+    """
+    ID of the RefinedModelMethod (case insensitive), None if there is none
+    """
+    return _getLookup(RefinedModelMethod).get(name.lower())
@@ -0,0 +1,24 @@
+"""
+Command building the per-chain cache of the map derived annotation files
+"""
+from django.core.management.base import BaseCommand
+from api.annotations import buildAnnotationStores
+
+
+class Command(BaseCommand):
+    """
+    Command to build the per-chain cache (NumPy arrays) of all the annotation files
+    (*.deepres/monores/blocres/mapq/fscq/daq.aa.pdb) found on disk
+    """
+    help = "Build the per-chain cache of the map derived annotation files"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='<optional> rebuild all the cache files, even if up to date')
+
+    def handle(self, *args, **options):
+        print("Building annotation cache")
+        count = buildAnnotationStores(rebuild=options['rebuild'])
+        print("Annotation files:", count)
+        print("Done.")
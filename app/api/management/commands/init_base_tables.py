@@ -1,5 +1,7 @@
 from django.core.management.base import BaseCommand
 from api.utils import init_base_tables
+from api.models import DATA_STRUCTURES, DATA_REFINED
+from api.generations import updatingDomains
 
 
 class Command(BaseCommand):
@@ -12,4 +14,6 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         print(help)
-        init_base_tables()
+        # refined model sources and methods, and topics
+        with updatingDomains(DATA_STRUCTURES, DATA_REFINED):
+            init_base_tables()
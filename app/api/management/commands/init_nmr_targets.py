@@ -1,5 +1,7 @@
 from django.core.management.base import BaseCommand
 from api.utils import init_nmr_targets
+from api.models import DATA_STRUCTURES, DATA_NMR
+from api.generations import updatingDomains
 
 
 class Command(BaseCommand):
@@ -12,4 +14,6 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         print(help)
-        init_nmr_targets()
+        # NMR targets and their UniProt entries
+        with updatingDomains(DATA_STRUCTURES, DATA_NMR):
+            init_nmr_targets()
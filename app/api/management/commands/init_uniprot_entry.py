@@ -3,6 +3,8 @@ Command creating UniProt entries for each of the SARS-CoV-2 proteins in UniProtE
 """
 from django.core.management.base import BaseCommand
 from api.utils import init_uniprot_entry
+from api.models import DATA_STRUCTURES
+from api.generations import updatingDomains
 
 
 class Command(BaseCommand):
@@ -21,5 +23,6 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         filepath = options['file_path'][0]
         print("Initializing UniProtEntry for SARS-CoV-2 data from ", filepath)
-        init_uniprot_entry(filepath)
+        with updatingDomains(DATA_STRUCTURES):
+            init_uniprot_entry(filepath)
         print("Done.")
@@ -0,0 +1,25 @@
+"""
+Command registering the map derived annotation files in the DB
+"""
+from django.core.management.base import BaseCommand
+from api.annotations import registerAnnotationFiles
+from api.models import DATA_EMV
+from api.generations import updatingDomains
+
+
+class Command(BaseCommand):
+    """
+    Command to populate the Entry/DataFile tables with the annotation files
+    (*.deepres/monores/blocres/mapq/fscq/daq.aa.pdb) found on disk
+    """
+    help = "Register the map derived annotation files in the DB (Entry/DataFile)"
+    requires_migrations_checks = True
+
+    def handle(self, *args, **options):
+        print("Registering annotation files")
+        with updatingDomains(DATA_EMV):
+            stats = registerAnnotationFiles()
+        print("New entries:", stats["entries"])
+        print("New files:", stats["added"])
+        print("Removed files:", stats["removed"])
+        print("Done.")
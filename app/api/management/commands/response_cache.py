@@ -0,0 +1,37 @@
+"""
+Command showing the stats of the shared response cache, or clearing it
+"""
+from django.core.management.base import BaseCommand
+from api.response_cache import getStats, clearStats, bumpGeneration, getGeneration
+
+
+class Command(BaseCommand):
+    """
+    Command to print the hits / misses of the response cache per view
+    and to invalidate all the cached responses
+    """
+    help = "Show the response cache stats, or clear the cache"
+    requires_migrations_checks = True
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='<optional> invalidate all the cached responses')
+        parser.add_argument(
+            '--reset-stats', action='store_true',
+            help='<optional> set the hit / miss counters to 0')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            print("Clearing the response cache")
+            print("Generation:", bumpGeneration())
+        else:
+            print("Generation:", getGeneration())
+        for viewName, stats in sorted(getStats().items()):
+            total = stats["hits"] + stats["misses"]
+            ratio = 100 * stats["hits"] / total if total else 0
+            print("%s: %s hits, %s misses (%.1f%%)" % (
+                viewName, stats["hits"], stats["misses"], ratio))
+        if options['reset_stats']:
+            clearStats()
+        print("Done.")
@@ -0,0 +1,35 @@
+"""
+Command running the queue of EMV computation jobs
+"""
+from django.core.management.base import BaseCommand
+from api.emv_jobs import runEmvWorker, DEFAULT_WORKERS
+
+
+class Command(BaseCommand):
+    """
+    Worker for the EMV computation jobs queued by /pdbAnnotFromMap/:
+    requests the computations to the EMV WebService and registers the
+    annotation files in DataFile when they are available
+    """
+    help = "Run the queue of EMV computation jobs"
+    requires_migrations_checks = True
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=DEFAULT_WORKERS,
+            help='<optional> max. number of concurrent requests to the EMV WebService')
+        parser.add_argument(
+            '--interval', type=int, default=60,
+            help='<optional> seconds between checks of the queue')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='<optional> process the queue once and exit')
+
+    def handle(self, *args, **options):
+        print("Running EMV jobs")
+        stats = runEmvWorker(workers=options['workers'],
+                             interval=options['interval'], once=options['once'])
+        print("Submitted:", stats["submitted"])
+        print("Done:", stats["done"])
+        print("Failed:", stats["failed"])
+        print("Done.")
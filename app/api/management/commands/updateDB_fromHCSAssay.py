@@ -3,6 +3,8 @@ Command for updating IDR data and the associated additional analyses
 """
 from django.core.management.base import BaseCommand
 from api.utils import IDRUtils
+from api.models import DATA_IDR
+from api.generations import updatingDomains
 
 
 
@@ -23,5 +25,6 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         assayPath = options['assayPath'][0]
         print("Reading data for", assayPath)
-        IDRUtils()._updateDB_fromHCSAssay(assayPath=assayPath)
+        with updatingDomains(DATA_IDR):
+            IDRUtils()._updateDB_fromHCSAssay(assayPath=assayPath)
 
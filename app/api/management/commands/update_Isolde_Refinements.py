@@ -4,6 +4,8 @@ https://github.com/thorn-lab/coronavirus_structural_task_force
 """
 from django.core.management.base import BaseCommand
 from api.utils import update_isolde_refinements
+from api.models import DATA_REFINED
+from api.generations import updatingDomains
 
 
 class Command(BaseCommand):
@@ -14,5 +16,6 @@ class Command(BaseCommand):
     requires_migrations_checks = True
 
     def handle(self, *args, **options):
-        update_isolde_refinements()
+        with updatingDomains(DATA_REFINED):
+            update_isolde_refinements()
         print("Done.")
@@ -3,6 +3,8 @@ Command updating the NMR data from local CSV file containing all binding and not
 """
 from django.core.management.base import BaseCommand
 from api.utils import update_NMR_binding
+from api.models import DATA_NMR
+from api.generations import updatingDomains
 
 
 class Command(BaseCommand):
@@ -21,5 +23,6 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         filepath = options['file_path'][0]
         print("Reading NMR binding data from ", filepath)
-        update_NMR_binding(filepath)
+        with updatingDomains(DATA_NMR):
+            update_NMR_binding(filepath)
         print("Done.")
\ No newline at end of file
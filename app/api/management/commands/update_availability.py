@@ -0,0 +1,29 @@
+"""
+Command computing the data available for each PDB entry
+"""
+from django.core.management.base import BaseCommand
+from api.models import PdbEntryAvailability, DATA_STRUCTURES
+from api.availability import AVAILABILITY_FLAGS, updateAvailability
+from api.generations import bumpGeneration
+
+
+class Command(BaseCommand):
+    """
+    Command to compute all the PdbEntryAvailability flags again
+    (the update commands only compute the flags of the data they update).
+    Run when the container starts, the generation is only bumped on changes.
+    """
+    help = "Compute the PDB-REDO / CERES / IDR / NMR availability of all the PDB entries"
+    requires_migrations_checks = True
+
+    def handle(self, *args, **options):
+        print("Computing the availability of the PDB entries")
+        # all the flags depend on DATA_STRUCTURES
+        changed = updateAvailability(DATA_STRUCTURES)
+        if changed:
+            # cached /pdbentry/ responses filtered with the old flags
+            bumpGeneration(DATA_STRUCTURES)
+        for flag in AVAILABILITY_FLAGS:
+            print("%s:" % flag, PdbEntryAvailability.objects.filter(**{flag: True}).count())
+        print("Entries:", PdbEntryAvailability.objects.count(), "changed:", changed)
+        print("Done.")
@@ -11,10 +11,12 @@ from api.models import (
     RefinedModel,
     RefinedModelMethod,
     RefinedModelSource,
+    DATA_REFINED,
 )
 from api.utils import save_json, updateRefinedModel
 from api.dataPaths import URL_PHENIX_STATUS
 from .update_utils import log_info, save_entries, log_progress, HTTP_TIMEOUT
+from api.generations import updatingDomains
 
 
 class Command(BaseCommand):
@@ -35,7 +37,8 @@ class Command(BaseCommand):
         log_info("Success: " + str(len(success)))
         log_info("Not found: " + str(len(not_found)))
         save_entries(success, not_found, "ceres", save_json, "/data/ceres_entries")
-        update_ceres_entries(success, not_found)
+        with updatingDomains(DATA_REFINED):
+            update_ceres_entries(success, not_found)
         log_info("** Finished updating CERES entries **")
 
 
@@ -0,0 +1,20 @@
+"""
+Command downloading the list of entries of the DAQ-Score Database
+"""
+from django.core.management.base import BaseCommand
+from api.daq import updateEntryList
+
+
+class Command(BaseCommand):
+    """
+    Command to download the DAQ entry list (entry_ids.txt) into the local cache.
+    The API refreshes it in the background anyway, this is a warm-up run
+    when the container starts, so that no request waits for the download.
+    """
+    help = "Download the list of entries of the DAQ-Score Database"
+
+    def handle(self, *args, **options):
+        print("Updating DAQ entry list")
+        count = updateEntryList()
+        print("DAQ entries:", count)
+        print("Done.")
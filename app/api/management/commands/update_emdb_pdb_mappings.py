@@ -0,0 +1,29 @@
+"""
+Command updating the EMDB <-> PDB mappings table
+"""
+from django.core.management.base import BaseCommand
+from api.mappings import updateMappings
+
+
+class Command(BaseCommand):
+    """
+    Command to copy the EMDB <-> PDB pairs of the HybridModel table into
+    EmdbPdbMapping and, optionally, query 3DBionotes again for the pairs
+    that were found there
+    """
+    help = "Update the EMDB <-> PDB mappings"
+    requires_migrations_checks = True
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--remote-max-age', type=int, default=None,
+            help='<optional> query again the remote pairs older than these days')
+
+    def handle(self, *args, **options):
+        print("Updating EMDB <-> PDB mappings")
+        stats = updateMappings(remoteMaxAge=options['remote_max_age'])
+        print("Pairs in DB:", stats["local"])
+        print("Added:", stats["added"])
+        print("Removed:", stats["removed"])
+        print("Remote entries checked:", stats["remoteChecked"])
+        print("Done.")
@@ -0,0 +1,36 @@
+"""
+Command updating the EMV data-file catalog from the data directories
+"""
+from django.core.management.base import BaseCommand
+from api.emv_catalog import updateEmvCatalog
+from api.models import DATA_EMV
+from api.generations import bumpGeneration
+
+
+class Command(BaseCommand):
+    """
+    Command to update the EMV data-file catalog.
+    Only the directories modified since the last run are scanned again,
+    and the EMV data generation is only bumped if some file changed.
+    """
+    help = "Update the EMV data-file catalog (JSON, PDB, mmCIF files) from the data directories"
+    requires_migrations_checks = True
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='<optional> scan all directories, even if not modified')
+
+    def handle(self, *args, **options):
+        print("Updating EMV data-file catalog")
+        try:
+            stats = updateEmvCatalog(full=options['full'])
+        except Exception:
+            # some dirs may have been updated already
+            bumpGeneration(DATA_EMV)
+            raise
+        # run when the container starts, keep the cached responses if nothing changed
+        if any(stats[count] for count in ["added", "updated", "removed", "removedDirs"]):
+            bumpGeneration(DATA_EMV)
+        print(stats)
+        print("Done.")
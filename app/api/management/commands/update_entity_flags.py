@@ -0,0 +1,45 @@
+"""
+Command computing the antibody / nanobody / sybody flags of the entities
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.models import ModelEntity, ENTITY_CLASS_KEYWORDS, DATA_STRUCTURES
+from api.generations import bumpGeneration
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    """
+    Command to set the isAntibody, isNanobody and isSybody flags of the
+    existing ModelEntity rows (new and updated entities are classified on save).
+    Run when the container starts, only the changed rows are saved.
+    """
+    help = "Backfill the antibody / nanobody / sybody flags of the entities"
+    requires_migrations_checks = True
+
+    def handle(self, *args, **options):
+        print("Classifying entities")
+        flags = list(ENTITY_CLASS_KEYWORDS)
+        changed = []
+        total = 0
+        updated = 0
+        with transaction.atomic():
+            for entity in ModelEntity.objects.only(
+                    'name', 'details', 'altNames', *flags).iterator(chunk_size=BATCH_SIZE):
+                total += 1
+                before = [getattr(entity, flag) for flag in flags]
+                entity.classify()
+                if before != [getattr(entity, flag) for flag in flags]:
+                    changed.append(entity)
+                if len(changed) >= BATCH_SIZE:
+                    updated += ModelEntity.objects.bulk_update(changed, flags)
+                    changed = []
+            updated += ModelEntity.objects.bulk_update(changed, flags)
+        if updated:
+            # cached responses with the old flags
+            bumpGeneration(DATA_STRUCTURES)
+        for flag in flags:
+            print("%s:" % flag, ModelEntity.objects.filter(**{flag: True}).count())
+        print("Entities:", total, "updated:", updated)
+        print("Done.")
@@ -1,5 +1,7 @@
 from django.core.management.base import BaseCommand
 from api.utils import get_structures_from_path
+from api.models import DATA_STRUCTURES, DATA_REFINED
+from api.generations import updatingDomains
 
 
 class Command(BaseCommand):
@@ -24,4 +26,5 @@ class Command(BaseCommand):
         print("Reading data from", path)
         if start:
             print("\tstarting from ", start)
-        get_structures_from_path(path, start)
+        with updatingDomains(DATA_STRUCTURES, DATA_REFINED):
+            get_structures_from_path(path, start)
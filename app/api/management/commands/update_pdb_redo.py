@@ -3,10 +3,11 @@ import time
 from urllib.parse import urljoin
 import requests
 from django.core.management.base import BaseCommand
-from api.models import PdbEntry, RefinedModel, RefinedModelMethod, RefinedModelSource
+from api.models import PdbEntry, RefinedModel, RefinedModelMethod, RefinedModelSource, DATA_REFINED
 from api.dataPaths import URL_PDB_REDO
 from api.utils import save_json, updateRefinedModel
 from .update_utils import log_info, save_entries, log_progress, HTTP_TIMEOUT
+from api.generations import updatingDomains
 
 
 class Command(BaseCommand):
@@ -27,7 +28,8 @@ class Command(BaseCommand):
         save_entries(
             success, not_found, "pdb_redo", save_json, "/data/pdb_redo_entries"
         )
-        update_pdb_redo_entries(success, not_found)
+        with updatingDomains(DATA_REFINED):
+            update_pdb_redo_entries(success, not_found)
         log_info("** Finished updating PDB Redo entries **")
 
 
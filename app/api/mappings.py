@@ -0,0 +1,216 @@
+"""
+EMDB <-> PDB mappings
+
+Resolved from an in-memory cache, then from the DB (HybridModel, and
+EmdbPdbMapping for the pairs of entries not in the DB) and only on a miss
+from the 3DBionotes mappings API. Remote results are saved in EmdbPdbMapping.
+Both found and not found results are cached in memory, for different times.
+
+EmdbPdbMapping is refreshed in bulk by the `update_emdb_pdb_mappings` command.
+"""
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+import requests
+from django.db import transaction
+from django.utils import timezone
+
+from .dataPaths import BIONOTES_URL, MAPPINGS_WS_PATH
+from .models import HybridModel, EmdbPdbMapping, MAPPING_SOURCES
+
+logger = logging.getLogger(__name__)
+
+HTTP_TIMEOUT = 15
+REGEX_PDB_ID = re.compile(r'^\d\w{3}$')
+REGEX_EMDB_ID = re.compile(r'^EMD-\d{4,5}$')
+# seconds a result is kept in memory
+POSITIVE_TTL = 24 * 3600
+NEGATIVE_TTL = 3600
+CACHE_SIZE = 20000
+
+_cache = OrderedDict()
+_cacheLock = threading.Lock()
+
+
+def _getCached(key):
+    with _cacheLock:
+        cached = _cache.get(key)
+        if cached is None:
+            return None
+        expires, values = cached
+        if expires < time.time():
+            del _cache[key]
+            return None
+        _cache.move_to_end(key)
+        return values
+
+
+def _setCached(key, values):
+    ttl = POSITIVE_TTL if values else NEGATIVE_TTL
+    with _cacheLock:
+        _cache[key] = (time.time() + ttl, values)
+        _cache.move_to_end(key)
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def clearCache():
+    with _cacheLock:
+        _cache.clear()
+
+
+def normalizeEmdbId(emdb_id):
+    emdb_id = emdb_id.upper()
+    if not emdb_id.startswith('EMD-'):
+        emdb_id = 'EMD-' + emdb_id
+    return emdb_id
+
+
+def _getRemoteMappings(direction, db_id):
+    """
+    Query the 3DBionotes API:
+        https://3dbionotes.cnb.csic.es/api/mappings/PDB/EMDB/7a02/
+        https://3dbionotes.cnb.csic.es/api/mappings/EMDB/PDB/EMD-2810
+    None if the service could not answer
+    """
+    url = BIONOTES_URL + "/" + MAPPINGS_WS_PATH + "/" + direction + "/" + db_id
+    logger.debug("WS-qry: %s", url)
+    try:
+        headers = {'accept': 'application/json'}
+        resp = requests.get(url, headers=headers, timeout=(2, HTTP_TIMEOUT))
+        if resp.status_code == 404:
+            return []
+        if not resp.status_code == 200:
+            logger.debug("WS-response: %s", resp.status_code)
+            return None
+        jresp = resp.json()
+        logger.debug("WS-response: %s, %s", resp.status_code, jresp)
+        return jresp.get(db_id, []) if isinstance(jresp, dict) else []
+    except Exception as exc:
+        logger.exception(exc)
+        return None
+
+
+@transaction.atomic
+def _saveRemoteMappings(pairs):
+    for emdb_id, pdb_id in pairs:
+        EmdbPdbMapping.objects.update_or_create(
+            emdbId=emdb_id, pdbId=pdb_id,
+            defaults={"source": MAPPING_SOURCES[1]})
+
+
+def getEmdbMappings(pdb_id):
+    """
+    Find all EMDB volume maps (EMD-NNNNN) where a PDB model is fitted, by PDB ID
+    """
+    pdb_id = pdb_id.lower()
+    # Validate pdb_id to prevent SSRF
+    if not re.match(REGEX_PDB_ID, pdb_id):
+        raise ValueError("Invalid pdb_id format")
+    key = ("PDB", pdb_id)
+    values = _getCached(key)
+    if values is not None:
+        return values
+
+    # in the order they were added, as given by the 3DBionotes API
+    values = list(dict.fromkeys(HybridModel.objects.filter(
+        pdbId__dbId__iexact=pdb_id, emdbId__isnull=False).order_by('pk').values_list(
+        'emdbId__dbId', flat=True)))
+    if not values:
+        values = list(EmdbPdbMapping.objects.filter(
+            pdbId=pdb_id).order_by('pk').values_list('emdbId', flat=True))
+    if not values:
+        logger.debug("Check Bionotes WS for EMDB mappings for %s", pdb_id)
+        remote = _getRemoteMappings("PDB/EMDB", pdb_id)
+        if remote is None:
+            # service not available, do not ask again for a while
+            _setCached(key, [])
+            return []
+        values = [normalizeEmdbId(emdb_id) for emdb_id in remote]
+        _saveRemoteMappings([(emdb_id, pdb_id) for emdb_id in values])
+    _setCached(key, values)
+    return values
+
+
+def getPdbMappings(emdb_id):
+    """
+    Find all PDB models (lower case) fitted in a volume map, by EMDB ID
+    """
+    emdb_id = normalizeEmdbId(emdb_id)
+    if not re.match(REGEX_EMDB_ID, emdb_id):
+        raise ValueError("Invalid emdb_id format")
+    key = ("EMDB", emdb_id)
+    values = _getCached(key)
+    if values is not None:
+        return values
+
+    values = list(dict.fromkeys(pdb_id.lower() for pdb_id in HybridModel.objects.filter(
+        emdbId__dbId=emdb_id, pdbId__isnull=False).order_by('pk').values_list(
+        'pdbId__dbId', flat=True)))
+    if not values:
+        values = list(EmdbPdbMapping.objects.filter(
+            emdbId=emdb_id).order_by('pk').values_list('pdbId', flat=True))
+    if not values:
+        logger.debug("Check Bionotes WS for PDB mappings for %s", emdb_id)
+        remote = _getRemoteMappings("EMDB/PDB", emdb_id)
+        if remote is None:
+            _setCached(key, [])
+            return []
+        values = [pdb_id.lower() for pdb_id in remote]
+        _saveRemoteMappings([(emdb_id, pdb_id) for pdb_id in values])
+    _setCached(key, values)
+    return values
+
+
+def updateMappings(remoteMaxAge=None):
+    """
+    Copy the HybridModel pairs into EmdbPdbMapping and drop the ones removed.
+    With remoteMaxAge (days), remote pairs older than that are queried again.
+    """
+    stats = {"local": 0, "added": 0, "removed": 0, "remoteChecked": 0}
+    localPairs = set(
+        (emdb_id, pdb_id.lower()) for emdb_id, pdb_id in HybridModel.objects.filter(
+            emdbId__isnull=False, pdbId__isnull=False).values_list(
+            'emdbId__dbId', 'pdbId__dbId'))
+    stats["local"] = len(localPairs)
+
+    with transaction.atomic():
+        existing = {(m.emdbId, m.pdbId): m for m in EmdbPdbMapping.objects.all()}
+        toCreate = [EmdbPdbMapping(emdbId=emdb_id, pdbId=pdb_id,
+                                   source=MAPPING_SOURCES[0])
+                    for emdb_id, pdb_id in localPairs if (emdb_id, pdb_id) not in existing]
+        EmdbPdbMapping.objects.bulk_create(toCreate, batch_size=1000)
+        # pairs now in the DB
+        EmdbPdbMapping.objects.filter(
+            id__in=[m.id for pair, m in existing.items()
+                    if pair in localPairs and m.source != MAPPING_SOURCES[0]]
+        ).update(source=MAPPING_SOURCES[0])
+        # pairs removed from the DB
+        removed = [m.id for pair, m in existing.items()
+                   if pair not in localPairs and m.source == MAPPING_SOURCES[0]]
+        EmdbPdbMapping.objects.filter(id__in=removed).delete()
+    stats["added"] = len(toCreate)
+    stats["removed"] = len(removed)
+
+    if remoteMaxAge is not None:
+        limit = timezone.now() - timedelta(days=remoteMaxAge)
+        staleIds = set(EmdbPdbMapping.objects.filter(
+            source=MAPPING_SOURCES[1], updated__lt=limit).values_list('pdbId', flat=True))
+        for pdb_id in staleIds:
+            remote = _getRemoteMappings("PDB/EMDB", pdb_id)
+            if remote is None:
+                continue
+            stats["remoteChecked"] += 1
+            emdb_ids = [normalizeEmdbId(emdb_id) for emdb_id in remote]
+            with transaction.atomic():
+                EmdbPdbMapping.objects.filter(
+                    source=MAPPING_SOURCES[1], pdbId=pdb_id).exclude(
+                    emdbId__in=emdb_ids).delete()
+                _saveRemoteMappings([(emdb_id, pdb_id) for emdb_id in emdb_ids])
+
+    clearCache()
+    return stats
@@ -67,6 +67,137 @@ class DataFile(models.Model):
     fileType = models.CharField(max_length=12, blank=True, default='')
     method = models.CharField(max_length=12, blank=True, default='')
 
+
+class EmvCatalogDir(models.Model):
+    '''
+        Directory indexed by the EMV data-file catalog.
+        Its mtime tells whether the files in it have to be scanned again.
+    '''
+    source = models.CharField(max_length=25, blank=False, default='')
+    path = models.CharField(max_length=255, unique=True)
+    mtime = models.FloatField(default=0)
+
+    def __str__(self):
+        return '%s (%s)' % (self.path, self.source)
+
+
+class EmvDataFile(models.Model):
+    '''
+        EMV data file (JSON, PDB, mmCIF) found in an EmvCatalogDir
+    '''
+    directory = models.ForeignKey(EmvCatalogDir,
+                                  related_name='files', on_delete=models.CASCADE)
+    source = models.CharField(max_length=25, blank=False, default='')
+    emdbId = models.CharField(max_length=10, blank=True, default='')
+    pdbId = models.CharField(max_length=4, blank=True, default='')
+    method = models.CharField(max_length=50, blank=True, default='')
+    fileFormat = models.CharField(max_length=10, blank=True, default='')
+    filename = models.CharField(max_length=255, blank=False, default='')
+    path = models.CharField(max_length=512, blank=False, default='')
+    mtime = models.FloatField(default=0)
+    size = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['source', 'emdbId', 'method', 'fileFormat']),
+            models.Index(fields=['source', 'pdbId', 'method', 'fileFormat']),
+            models.Index(fields=['source', 'method', 'filename']),
+        ]
+
+    def __str__(self):
+        return '%s (%s)' % (self.filename, self.source)
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUBMITTED = "submitted"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_STATUS = [
+    (JOB_QUEUED, "Queued"),
+    (JOB_RUNNING, "Running"),
+    (JOB_SUBMITTED, "Submitted"),
+    (JOB_DONE, "Done"),
+    (JOB_FAILED, "Failed"),
+]
+
+
+class EmvJob(models.Model):
+    '''
+        Computation of the map derived annotations of a PDB chain,
+        requested to the EMV WebService by the `run_emv_jobs` worker
+    '''
+    unique_id = models.UUIDField(
+        primary_key=True, default=uuid.uuid4, editable=False)
+    pdbId = models.CharField(max_length=4, blank=False, default='')
+    chainId = models.CharField(max_length=4, blank=False, default='')
+    modifiedModel = models.CharField(max_length=10, blank=True, default='')
+    status = models.CharField(
+        max_length=10, choices=JOB_STATUS, default=JOB_QUEUED)
+    attempts = models.IntegerField(default=0)
+    detail = models.CharField(max_length=255, blank=True, default='')
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+    submitted = models.DateTimeField(blank=True, null=True)
+    finished = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        unique_together = ('pdbId', 'chainId', 'modifiedModel')
+        indexes = [
+            models.Index(fields=['status', 'created']),
+        ]
+
+    def __str__(self):
+        return '%s/%s%s (%s)' % (self.pdbId, self.chainId,
+                                 '/' + self.modifiedModel if self.modifiedModel else '',
+                                 self.status)
+
+
+DATA_STRUCTURES = "structures"
+DATA_REFINED = "refined"
+DATA_NMR = "nmr"
+DATA_IDR = "idr"
+DATA_EMV = "emv"
+DATA_DOMAINS = [
+    (DATA_STRUCTURES, "PDB/EMDB entries and structures"),
+    (DATA_REFINED, "Refined models"),
+    (DATA_NMR, "NMR ligand binding"),
+    (DATA_IDR, "IDR HCS assays"),
+    (DATA_EMV, "EMV validation files"),
+]
+# not a data domain, bumped to drop all the cached responses at once
+RESPONSE_CACHE_GENERATION = "responses"
+
+
+class DataGeneration(models.Model):
+    '''
+        Counter of the updates of a data domain, bumped by the update
+        commands when they commit. Cached responses and ETags built from
+        these data are keyed by it.
+    '''
+    domain = models.CharField(
+        max_length=20, choices=DATA_DOMAINS + [
+            (RESPONSE_CACHE_GENERATION, "All the cached responses")],
+        primary_key=True)
+    generation = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return '%s (%s)' % (self.domain, self.generation)
+
+
+class ResponseCacheStats(models.Model):
+    '''
+        Hits and misses of the shared response cache per view. Each worker
+        adds its counts from time to time (see api/response_cache.py)
+    '''
+    view = models.CharField(max_length=100, primary_key=True)
+    hits = models.PositiveBigIntegerField(default=0)
+    misses = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return '%s (%s hits, %s misses)' % (self.view, self.hits, self.misses)
+
 # ========== ========== ========== ========== ========== ========== ==========
 
 
@@ -146,6 +277,29 @@ class HybridModel(models.Model):
         return '%s(%s)' % (self.pdbId.dbId if self.pdbId else '', self.emdbId.dbId if self.emdbId else '')
 
 
+MAPPING_SOURCES = ["hybridmodel", "3dbionotes"]
+
+
+class EmdbPdbMapping(models.Model):
+    '''
+        EMDB map <-> PDB model pair, from the HybridModel table or from
+        the 3DBionotes mappings API (for entries not in the DB)
+    '''
+    emdbId = models.CharField(max_length=10, blank=False, default='')
+    pdbId = models.CharField(max_length=4, blank=False, default='')
+    source = models.CharField(max_length=12, blank=False, default='')
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('emdbId', 'pdbId')
+        indexes = [
+            models.Index(fields=['pdbId']),
+        ]
+
+    def __str__(self):
+        return '%s(%s)' % (self.pdbId, self.emdbId)
+
+
 class UniProtEntry(models.Model):
     dbId = models.CharField(max_length=20, blank=False,
                             default='', primary_key=True)
@@ -191,6 +345,27 @@ class PdbEntry(models.Model):
         return '%s' % (self.dbId, )
 
 
+class PdbEntryAvailability(models.Model):
+    '''
+        Data available for each PdbEntry, denormalized from the refined
+        models, the NMR targets and the IDR wells so that the /pdbentry/
+        filters are indexed equality predicates. Kept up to date by the
+        update commands (see availability.py).
+    '''
+    pdbEntry = models.OneToOneField(PdbEntry,
+                                    related_name='availability',
+                                    primary_key=True,
+                                    on_delete=models.CASCADE)
+    isPdbRedo = models.BooleanField(default=False, db_index=True)
+    isCeres = models.BooleanField(default=False, db_index=True)
+    isIdr = models.BooleanField(default=False, db_index=True)
+    isNmr = models.BooleanField(default=False, db_index=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return '%s (availability)' % (self.pdbEntry_id,)
+
+
 class PdbToEntity(models.Model):
     pdbId = models.ForeignKey(PdbEntry,
                               related_name='pdbentities',
@@ -226,6 +401,15 @@ class Organism(models.Model):
         return '(%s) %s' % (self.ncbi_taxonomy_id, self.scientific_name)
 
 
+ENTITY_CLASS_KEYWORDS = {
+    'isAntibody': ['antibody', 'antibodies', 'fab', 'heavy', 'light'],
+    'isNanobody': ['nanobody', 'nanobodies', 'nonobody'],
+    'isSybody': ['synthetic nanobody', 'sybody', 'sybodies'],
+}
+# fields of ModelEntity the classification is made from
+ENTITY_CLASS_SOURCES = ['name', 'details', 'altNames']
+
+
 class ModelEntity(models.Model):
     uniprotAcc = models.ForeignKey(UniProtEntry,
                                    blank=True,
@@ -246,38 +430,26 @@ class ModelEntity(models.Model):
     start = models.IntegerField(null=True, blank=True)
     end = models.IntegerField(null=True, blank=True)
 
-    @property
-    def isAntibody(self):
-        found = False
-        kwords = ['antibody', 'antibodies', 'fab', 'heavy', 'light']
-        for word in kwords:
-            if word in self.name.lower() or word in self.details.lower(
-            ) or word in self.altNames.lower():
-                found = True
-                break
-        return found
-
-    @property
-    def isNanobody(self):
-        found = False
-        kwords = ['nanobody', 'nanobodies', 'nonobody']
-        for word in kwords:
-            if word in self.name.lower() or word in self.details.lower(
-            ) or word in self.altNames.lower():
-                found = True
-                break
-        return found
-
-    @property
-    def isSybody(self):
-        found = False
-        kwords = ['synthetic nanobody', 'sybody', 'sybodies']
-        for word in kwords:
-            if word in self.name.lower() or word in self.details.lower(
-            ) or word in self.altNames.lower():
-                found = True
-                break
-        return found
+    # classification by keywords in name, details or altNames, stored on save
+    isAntibody = models.BooleanField(default=False, db_index=True)
+    isNanobody = models.BooleanField(default=False, db_index=True)
+    isSybody = models.BooleanField(default=False, db_index=True)
+
+    def classify(self):
+        """
+        Set the isAntibody, isNanobody and isSybody flags from the texts of the entity
+        """
+        texts = [(self.name or '').lower(), (self.details or '').lower(),
+                 (self.altNames or '').lower()]
+        for flag, kwords in ENTITY_CLASS_KEYWORDS.items():
+            setattr(self, flag, any(word in text for word in kwords for text in texts))
+
+    def save(self, *args, **kwargs):
+        self.classify()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(ENTITY_CLASS_SOURCES):
+            kwargs['update_fields'] = set(update_fields) | set(ENTITY_CLASS_KEYWORDS)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return '%s-%s' % (self.name, self.type)
@@ -652,6 +824,12 @@ class WellEntity(models.Model):
         max_length=255, blank=True, default='')
     channels = models.CharField(max_length=255, blank=True, default='')
 
+    class Meta:
+        indexes = [
+            # control wells of the plates
+            models.Index(fields=['plate', 'controlType']),
+        ]
+
     def __str__(self):
         return '%s (WellEntity)' % (self.dbId)
 
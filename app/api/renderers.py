@@ -0,0 +1,258 @@
+"""
+Binary renderers for the per-residue score series
+
+The residue series (map derived annotations, EMV chains) are sent as typed
+columns instead of lists of {"begin": "...", "value": ...} objects:
+    series: int32, index of the series (algorithm / chain) in `series`
+    chain: dictionary encoded (int32 indices + list of chain names)
+    residue: int32 residue number
+    end: int32 last residue of the segment (only for segment encoded series)
+    score: float32
+    residueName: dictionary encoded (EMV data only)
+
+    Accept: application/msgpack -> MessagePack map, columns as little-endian bytes
+    Accept: application/vnd.apache.arrow.stream -> Arrow IPC stream,
+        `header` and `series` as JSON in the schema metadata
+
+msgpack and pyarrow are optional, their renderers are only offered if installed.
+"""
+import io
+import json
+import logging
+
+import numpy as np
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+
+def _toInt(value):
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        return None
+
+
+def _toFloat(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+class ResidueColumns(object):
+    """
+    Residue series of a response, as columns
+    """
+
+    def __init__(self):
+        self.header = {}
+        self.series = []
+        self.seriesIdx = []
+        self.chains = []
+        self.residues = []
+        self.ends = []
+        self.scores = []
+        self.residueNames = []
+        self.hasEnds = False
+        self.hasResidueNames = False
+
+    def __len__(self):
+        return len(self.residues)
+
+    def addAnnotation(self, algoDataDict, extra=None):
+        """
+        {"chain", "data": [{"begin", ["end"], "value"}], ...}
+        """
+        meta = {key: value for key, value in algoDataDict.items() if key != "data"}
+        if extra:
+            meta.update(extra)
+        idx = len(self.series)
+        self.series.append(meta)
+        chain_id = str(algoDataDict.get("chain", ""))
+        for item in algoDataDict.get("data") or []:
+            begin = _toInt(item.get("begin"))
+            if begin is None:
+                continue
+            end = _toInt(item["end"]) if "end" in item else begin
+            self.hasEnds = self.hasEnds or "end" in item
+            self._addRow(idx, chain_id, begin, end, _toFloat(item.get("value")), '')
+
+    def addEmvChain(self, chainData):
+        """
+        {"name", "seqData": [{"resSeqName", "resSeqNumber", "scoreValue"}]}
+        """
+        meta = {key: value for key, value in chainData.items() if key != "seqData"}
+        idx = len(self.series)
+        self.series.append(meta)
+        chain_id = str(chainData.get("name", ""))
+        self.hasResidueNames = True
+        for item in chainData.get("seqData") or []:
+            residue = _toInt(item.get("resSeqNumber"))
+            if residue is None:
+                continue
+            self._addRow(idx, chain_id, residue, residue,
+                         _toFloat(item.get("scoreValue")), str(item.get("resSeqName", '')))
+
+    def _addRow(self, idx, chain_id, residue, end, score, residueName):
+        self.seriesIdx.append(idx)
+        self.chains.append(chain_id)
+        self.residues.append(residue)
+        self.ends.append(end)
+        self.scores.append(score)
+        self.residueNames.append(residueName)
+
+    def getColumns(self):
+        """
+        [(name, values array, dictionary or None)]
+        """
+        chainDict, chainIdx = np.unique(np.array(self.chains, dtype=str), return_inverse=True)
+        columns = [
+            ("series", np.asarray(self.seriesIdx, dtype='<i4'), None),
+            ("chain", chainIdx.astype('<i4'), chainDict.tolist()),
+            ("residue", np.asarray(self.residues, dtype='<i4'), None),
+        ]
+        if self.hasEnds:
+            columns.append(("end", np.asarray(self.ends, dtype='<i4'), None))
+        columns.append(("score", np.asarray(self.scores, dtype='<f4'), None))
+        if self.hasResidueNames:
+            nameDict, nameIdx = np.unique(
+                np.array(self.residueNames, dtype=str), return_inverse=True)
+            columns.append(("residueName", nameIdx.astype('<i4'), nameDict.tolist()))
+        return columns
+
+
+def _isAnnotation(item):
+    return isinstance(item, dict) and isinstance(item.get("data"), list) and "chain" in item
+
+
+def getResidueColumns(data):
+    """
+    ResidueColumns of the known responses with residue series, None for others
+    """
+    columns = ResidueColumns()
+    if isinstance(data, list) and data and all(_isAnnotation(item) for item in data):
+        # pdbAnnotFromMap: [algoDataDict, ...]
+        for item in data:
+            columns.addAnnotation(item)
+    elif isinstance(data, list) and data and all(
+            isinstance(item, dict) and "annotations" in item for item in data):
+        # pdbAnnotFromMap batch: [{"pdb_id", "chain_id", "modified_model", "annotations"}]
+        for item in data:
+            extra = {key: value for key, value in item.items() if key != "annotations"}
+            for algoDataDict in item["annotations"]:
+                columns.addAnnotation(algoDataDict, extra)
+    elif isinstance(data, dict) and isinstance(data.get("chains"), list):
+        # EMV data: {..., "chains": [{"name", "seqData": [...]}]}
+        columns.header = {key: value for key, value in data.items() if key != "chains"}
+        for chainData in data["chains"]:
+            if isinstance(chainData, dict):
+                columns.addEmvChain(chainData)
+    elif isinstance(data, dict) and data and all(
+            isinstance(value, list) and all(_isAnnotation(item) for item in value)
+            for value in data.values()):
+        # pdbAnnotFromMap all chains: {chain_id: [algoDataDict, ...]}
+        for algoDataDicts in data.values():
+            for item in algoDataDicts:
+                columns.addAnnotation(item)
+    else:
+        return None
+    return columns
+
+
+class MsgPackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        columns = getResidueColumns(data)
+        if columns is None:
+            return msgpack.packb(data, default=str)
+        content = {
+            "header": columns.header,
+            "series": columns.series,
+            "length": len(columns),
+            "columns": {},
+        }
+        for name, values, dictionary in columns.getColumns():
+            if dictionary is None:
+                content["columns"][name] = values.tobytes()
+            else:
+                content["columns"][name] = {
+                    "dictionary": dictionary, "indices": values.tobytes()}
+        return msgpack.packb(content, default=str)
+
+
+class ArrowStreamRenderer(BaseRenderer):
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        columns = getResidueColumns(data)
+        if columns is None:
+            # not a residue series (e.g. an error): empty table, data as header
+            columns = ResidueColumns()
+            columns.header = data
+        arrays = []
+        names = []
+        for name, values, dictionary in columns.getColumns():
+            if dictionary is None:
+                arrays.append(pa.array(values))
+            else:
+                arrays.append(pa.DictionaryArray.from_arrays(
+                    pa.array(values), pa.array(dictionary, type=pa.string())))
+            names.append(name)
+        metadata = {
+            "header": json.dumps(columns.header, default=str),
+            "series": json.dumps(columns.series, default=str),
+        }
+        table = pa.Table.from_arrays(arrays, names=names, metadata=metadata)
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue()
+
+
+BINARY_RENDERER_CLASSES = []
+if msgpack is not None:
+    BINARY_RENDERER_CLASSES.append(MsgPackRenderer)
+if pa is not None:
+    BINARY_RENDERER_CLASSES.append(ArrowStreamRenderer)
+BINARY_FORMATS = [renderer.format for renderer in BINARY_RENDERER_CLASSES]
+
+
+def getResidueRendererClasses(renderer_classes=None):
+    """
+    Renderers of a view sending residue series: its own (default ones if None)
+    followed by the binary ones available
+    """
+    if renderer_classes is None:
+        renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    return list(renderer_classes) + BINARY_RENDERER_CLASSES
+
+
+def isBinaryRendered(request):
+    """
+    Whether the response to request will be rendered by a binary renderer
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    return getattr(renderer, 'format', None) in BINARY_FORMATS
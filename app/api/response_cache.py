@@ -0,0 +1,204 @@
+"""
+Shared cache of the responses of the read-only endpoints
+
+Responses are stored in the `responses` cache (settings.CACHES, file based so
+that it is shared by all the workers) keyed by the view, the normalized URL
+(scheme, host, path + sorted query params), the Accept header, the
+generations of the data domains the view depends on (see generations.py)
+and the cache generation.
+Bumping the cache generation (`response_cache --clear`, kept in DataGeneration
+so that culling the cache does not reset it) drops all the cached responses
+at once, old entries just expire.
+
+Responses without validators get an ETag built from the data generations
+and their content, so that clients can revalidate them.
+
+Only rendered 200 responses to GET requests are cached (not the streamed
+files, which are already served from disk). Hits and misses are counted per
+view in each worker and added to the ResponseCacheStats table from time to time.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlencode
+
+from django.core.cache import caches
+from django.db.models import F
+from django.http import HttpResponse, StreamingHttpResponse
+
+from . import generations
+from .generations import getGenerationTag
+from .models import ResponseCacheStats, RESPONSE_CACHE_GENERATION
+from .responses import isNotModified, notModifiedResponse
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE = 'responses'
+# seconds, overridden by each view with cache_timeout
+DEFAULT_TIMEOUT = 3600
+# views keyed by data generations only expire to free space
+DOMAINS_TIMEOUT = 7 * 24 * 3600
+CACHED_HEADERS = ['ETag', 'Last-Modified', 'Vary', 'Content-Disposition']
+# local counters are added to the shared ones every ... events or seconds
+STATS_FLUSH_EVENTS = 100
+STATS_FLUSH_INTERVAL = 60
+
+_stats = Counter()
+_statsLock = threading.Lock()
+_statsFlushed = time.time()
+
+
+def getCache():
+    return caches[RESPONSE_CACHE]
+
+
+def getGeneration():
+    return generations.getGeneration(RESPONSE_CACHE_GENERATION)
+
+
+def bumpGeneration():
+    """
+    Invalidate all the cached responses
+    """
+    generations.bumpGeneration(RESPONSE_CACHE_GENERATION)
+    return getGeneration()
+
+
+def getResponseCacheKey(viewName, request, domains=()):
+    query = urlencode(sorted(
+        (key, value) for key, values in request.GET.lists() for value in values))
+    accept = request.META.get('HTTP_ACCEPT', '').replace(' ', '')
+    # paginated responses have absolute next / previous links
+    normalized = "%s://%s%s?%s|%s|%s" % (
+        request.scheme, request.get_host(), request.path, query, accept,
+        getGenerationTag(domains))
+    return "resp:%s:%s:%s" % (viewName, getGeneration(),
+                              hashlib.sha1(normalized.encode()).hexdigest())
+
+
+def _countEvent(viewName, event):
+    global _statsFlushed
+    with _statsLock:
+        _stats[(viewName, event)] += 1
+        if (sum(_stats.values()) < STATS_FLUSH_EVENTS
+                and time.time() - _statsFlushed < STATS_FLUSH_INTERVAL):
+            return
+        pending = dict(_stats)
+        _stats.clear()
+        _statsFlushed = time.time()
+    _flushStats(pending)
+
+
+def _flushStats(pending):
+    try:
+        for (viewName, event), count in pending.items():
+            field = "hits" if event == "hit" else "misses"
+            ResponseCacheStats.objects.get_or_create(view=viewName)
+            ResponseCacheStats.objects.filter(view=viewName).update(
+                **{field: F(field) + count})
+    except Exception as exc:
+        logger.exception(exc)
+
+
+def getStats():
+    """
+    {view: {"hits", "misses"}} of all the workers (the counts not flushed
+    yet by each worker are not included)
+    """
+    return {stats.view: {"hits": stats.hits, "misses": stats.misses}
+            for stats in ResponseCacheStats.objects.all()}
+
+
+def clearStats():
+    ResponseCacheStats.objects.all().delete()
+
+
+def _fromCached(request, cached):
+    content, contentType, headers = cached
+    etag = headers.get('ETag')
+    if etag and isNotModified(request, etag):
+        return notModifiedResponse(etag)
+    response = HttpResponse(content, content_type=contentType)
+    for header, value in headers.items():
+        response[header] = value
+    response['X-Cache'] = 'HIT'
+    return response
+
+
+def _toCached(response, domains):
+    if not response.has_header('ETag'):
+        response['ETag'] = 'W/"%s-%s"' % (
+            getGenerationTag(domains), hashlib.sha1(response.content).hexdigest()[:16])
+    headers = {header: response[header]
+               for header in CACHED_HEADERS if response.has_header(header)}
+    return response.content, response['Content-Type'], headers
+
+
+class CachedResponseMixin(object):
+    """
+    Serve GET requests of a view from the shared response cache.
+    Must be the first base class of the view.
+        cache_domains: data domains (models.DATA_DOMAINS) of the responses
+        cache_timeout: seconds the response is kept, 0 to disable,
+            None for DOMAINS_TIMEOUT if the view has cache_domains
+            (DEFAULT_TIMEOUT otherwise)
+    """
+    cache_domains = ()
+    cache_timeout = None
+
+    def getCacheTimeout(self):
+        if self.cache_timeout is not None:
+            return self.cache_timeout
+        return DOMAINS_TIMEOUT if self.cache_domains else DEFAULT_TIMEOUT
+
+    def dispatch(self, request, *args, **kwargs):
+        timeout = self.getCacheTimeout()
+        if request.method != 'GET' or not timeout:
+            return super().dispatch(request, *args, **kwargs)
+        viewName = type(self).__name__
+        try:
+            cache = getCache()
+            key = getResponseCacheKey(viewName, request, self.cache_domains)
+            cached = cache.get(key)
+        except Exception as exc:
+            # cache not available, go on without it
+            logger.exception(exc)
+            return super().dispatch(request, *args, **kwargs)
+        if cached is not None:
+            _countEvent(viewName, "hit")
+            return _fromCached(request, cached)
+
+        _countEvent(viewName, "miss")
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code != 200 or isinstance(response, StreamingHttpResponse):
+            return response
+        if hasattr(response, 'render'):
+            response.render()
+        try:
+            cache.set(key, _toCached(response, self.cache_domains), timeout=timeout)
+        except Exception as exc:
+            logger.exception(exc)
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+class CachedWritableMixin(CachedResponseMixin):
+    """
+    CachedResponseMixin of the views accepting writes: the generations of
+    their cache_domains are bumped after each change, so that no cached
+    response outlives it.
+    """
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        generations.bumpGeneration(*self.cache_domains)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        generations.bumpGeneration(*self.cache_domains)
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        generations.bumpGeneration(*self.cache_domains)
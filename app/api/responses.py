@@ -0,0 +1,246 @@
+"""
+HTTP responses streaming data files from disk
+
+Files are sent as stored (no parsing / re-serialization) with validators
+derived from the files themselves: a strong ETag from path+mtime+size and
+Last-Modified, so that conditional requests get a 304 Not Modified.
+JSON files with precompressed sidecars (<file>.br, <file>.gz, written by the
+batch tools) are sent in the best encoding accepted by the client.
+"""
+import hashlib
+import logging
+import os
+import re
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+REGEX_RANGE = re.compile(r'^bytes=(?P<start>\d*)-(?P<end>\d*)$')
+
+CONTENT_TYPES = {
+    "json": "application/json",
+    "pdb": "chemical/x-pdb",
+    "mmcif": "chemical/x-mmcif",
+    "cif": "chemical/x-mmcif",
+}
+
+
+# preferred first
+PRECOMPRESSED_ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def getContentType(fileFormat):
+    return CONTENT_TYPES.get(fileFormat, "text/plain")
+
+
+def parseRange(rangeHeader, size):
+    """
+    (start, end) of the byte range requested (end included), None if there is
+    no Range header or it is not a single byte range (the whole content is sent)
+    """
+    if not rangeHeader:
+        return None
+    matchObj = REGEX_RANGE.match(rangeHeader.strip())
+    if not matchObj or not (matchObj.group("start") or matchObj.group("end")):
+        return None
+    if matchObj.group("start"):
+        start = int(matchObj.group("start"))
+        end = int(matchObj.group("end")) if matchObj.group("end") else size - 1
+    else:
+        # suffix range: last N bytes
+        start = max(size - int(matchObj.group("end")), 0)
+        end = size - 1
+    if start > end and matchObj.group("end"):
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def _getSegmentSize(segment):
+    if isinstance(segment, bytes):
+        return len(segment)
+    return os.path.getsize(segment)
+
+
+def _readSegments(segments, start, end):
+    """
+    Yield the bytes from start to end (included) of the segments
+    """
+    offset = 0
+    for segment, size in segments:
+        segStart = offset
+        offset += size
+        if offset <= start or segStart > end:
+            continue
+        first = max(start - segStart, 0)
+        last = min(end + 1 - segStart, size)
+        if isinstance(segment, bytes):
+            yield segment[first:last]
+            continue
+        with open(segment, 'rb') as f:
+            f.seek(first)
+            remaining = last - first
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+
+def getFilesETag(paths, extra=''):
+    """
+    Strong ETag of the content built from some files: changes when any of
+    them is replaced, touched or resized. Raises OSError if a file is missing.
+    """
+    digest = hashlib.sha1(extra.encode())
+    for path in paths:
+        fstat = os.stat(path)
+        digest.update(('%s:%s:%s;' % (
+            path, fstat.st_mtime_ns, fstat.st_size)).encode())
+    return '"%s"' % digest.hexdigest()
+
+
+def getFilesLastModified(paths):
+    return max(int(os.path.getmtime(path)) for path in paths)
+
+
+def _etagMatches(header, etag):
+    if header.strip() == '*':
+        return True
+    # weak comparison, as for If-None-Match
+    return etag in [tag.strip().replace('W/', '', 1) for tag in header.split(',')]
+
+
+def isNotModified(request, etag, lastModified=None):
+    """
+    Whether a conditional GET/HEAD request can be answered with a 304
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    ifNoneMatch = request.META.get('HTTP_IF_NONE_MATCH')
+    if ifNoneMatch:
+        return _etagMatches(ifNoneMatch, etag)
+    ifModifiedSince = parse_http_date_safe(
+        request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return bool(lastModified and ifModifiedSince
+                and lastModified <= ifModifiedSince)
+
+
+def setValidators(response, etag, lastModified=None):
+    response['ETag'] = etag
+    if lastModified:
+        response['Last-Modified'] = http_date(lastModified)
+    return response
+
+
+def notModifiedResponse(etag, lastModified=None):
+    return setValidators(HttpResponse(status=304), etag, lastModified)
+
+
+def fileResponse(request, segments, content_type, filename=None, etag=None):
+    """
+    Stream the concatenation of segments (file paths or bytes) supporting
+    single byte range requests (Range: bytes=...)
+    """
+    if isinstance(segments, (str, bytes)):
+        segments = [segments]
+    segments = [(segment, _getSegmentSize(segment)) for segment in segments]
+    size = sum(segSize for segment, segSize in segments)
+
+    rangeHeader = request.META.get('HTTP_RANGE')
+    ifRange = request.META.get('HTTP_IF_RANGE')
+    if ifRange and ifRange.strip() != etag:
+        # the client copy is not the current one, send it whole
+        rangeHeader = None
+    try:
+        byteRange = parseRange(rangeHeader, size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = 'bytes */%s' % size
+        return response
+
+    start, end = byteRange if byteRange else (0, size - 1)
+    response = StreamingHttpResponse(
+        _readSegments(segments, start, end),
+        status=206 if byteRange else 200,
+        content_type=content_type)
+    response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    if byteRange:
+        response['Content-Range'] = 'bytes %s-%s/%s' % (start, end, size)
+    if filename:
+        response['Content-Disposition'] = 'inline; filename="%s"' % filename
+    return response
+
+
+def getAcceptedEncodings(request):
+    """
+    Encodings in the Accept-Encoding header of the request (q > 0)
+    """
+    accepted = set()
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        fields = item.strip().split(';')
+        encoding = fields[0].strip().lower()
+        quality = 1.0
+        for param in fields[1:]:
+            name, _, value = param.strip().partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0
+        if encoding and quality > 0:
+            accepted.add(encoding)
+    return accepted
+
+
+def getPrecompressedFile(request, path):
+    """
+    (path, encoding) of the precompressed copy of a file to send, if the
+    client accepts its encoding and it is up to date, otherwise (path, None)
+    """
+    accepted = getAcceptedEncodings(request)
+    if not accepted:
+        return path, None
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return path, None
+    for encoding, ext in PRECOMPRESSED_ENCODINGS:
+        if encoding not in accepted:
+            continue
+        try:
+            if os.stat(path + ext).st_mtime >= mtime:
+                return path + ext, encoding
+        except OSError:
+            continue
+    return path, None
+
+
+def jsonFileResponse(request, path, filename=None):
+    """
+    Send a JSON file as stored (or its precompressed copy), or a 304 if the
+    client copy is up to date
+    """
+    sendPath, encoding = getPrecompressedFile(request, path)
+    etag = getFilesETag([sendPath])
+    lastModified = getFilesLastModified([sendPath])
+    if isNotModified(request, etag, lastModified):
+        response = notModifiedResponse(etag, lastModified)
+    else:
+        response = fileResponse(
+            request, sendPath, getContentType('json'), filename, etag)
+        if encoding:
+            response['Content-Encoding'] = encoding
+        setValidators(response, etag, lastModified)
+    response['Vary'] = 'Accept-Encoding'
+    return response
@@ -0,0 +1,40 @@
+"""
+Search results paged by the search engine
+
+SearchResults wraps a haystack SearchQuerySet as the object list given to
+the paginator: the total is the count of hits of the search engine, and each
+page only asks it for the hits of the page (in relevance order), whose rows
+are then fetched from the DB with one query (plus the prefetches of the
+queryset).
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SearchResults(object):
+    """
+    Sequence of the objects of queryset found by searchQuerySet,
+    in relevance order
+    """
+
+    def __init__(self, searchQuerySet, queryset):
+        self.searchQuerySet = searchQuerySet
+        self.queryset = queryset
+
+    def count(self):
+        return self.searchQuerySet.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        pks = [result.pk for result in self.searchQuerySet[key]]
+        objects = {str(obj.pk): obj for obj in self.queryset.filter(pk__in=pks)}
+        missing = [pk for pk in pks if pk not in objects]
+        if missing:
+            # index not updated yet
+            logger.warning("Search hits not found in the DB: %s", missing)
+        return [objects[pk] for pk in pks if pk in objects]
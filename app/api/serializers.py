@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from collections import OrderedDict
 from .models import *
-from django.db.models import Q
+from .idr_evidence import getIDREvidence, getControlWells
 
 
 class DataFileNestedSerializer(serializers.ModelSerializer):
@@ -18,6 +18,13 @@ class DataFileSerializer(serializers.ModelSerializer):
         fields = ['unique_id', 'path', 'filename', 'entry', 'data', 'fileType']
 
 
+class EmvJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = EmvJob
+        fields = ['unique_id', 'pdbId', 'chainId', 'modifiedModel', 'status',
+                  'attempts', 'detail', 'created', 'updated', 'submitted', 'finished']
+
+
 # ========== ========== ========== ========== ========== ========== ==========
 
 
@@ -81,31 +88,19 @@ class PlateEntitySerializer(serializers.ModelSerializer):
         fields = ['dbId', 'name', 'wells', 'controlWells']
 
     def get_wells(self, obj):
-
-        # Get ligand ID and list of IDs tuples from queryset context to pass it to WellEntitySerializer
-        context = self.context
-        ligand_entity = self.context.get('ligand_entity')
-        zip_list = self.context.get('zip_list')
-
-        # Given the ligand ID, get the get list of WellEntities  associated to that ligand
-        if ligand_entity:
-            wellid_list = []
-            for well in zip_list:
-                if well[3] == obj.dbId:  # tupl[3] = PlateEntity id
-                    wellid_list.append(well[4])  # tupl[4] = WellEntity id
-
-            # Given the list of Well IDs, get queryset including all WellEntity models and pass it to WellEntitySerializer
-            well_qs = WellEntity.objects.filter(
-                dbId__in=wellid_list).order_by('name')
-            return WellEntitySerializer(many=True,  context=context).to_representation(well_qs)
+        # Wells of the plate where the ligand was tested, from the ligand IDR evidence tree
+        evidence = self.context.get('idr_evidence')
+        if evidence is not None:
+            return WellEntitySerializer(many=True, context=self.context).to_representation(
+                evidence.getWells(obj))
 
     def get_controlWells(self, obj):
-
-        # Given the plate id, get queryset including all control wells and pass it to WellEntitySerializer
-        controls_qs = WellEntity.objects.filter(plate_id=obj.dbId).filter(
-            Q(controlType='positive') | Q(controlType='negative')
-        )
-        return WellEntitySerializer(many=True).to_representation(controls_qs)
+        # Positive and negative control wells of the plate, fetched for all the plates
+        # of the evidence tree at once and memoized until the IDR data change
+        evidence = self.context.get('idr_evidence')
+        if evidence is not None:
+            return evidence.getControlWells(obj)
+        return getControlWells([obj.pk]).get(obj.pk, [])
 
 
 class ScreenEntitySerializer(serializers.ModelSerializer):
@@ -117,24 +112,11 @@ class ScreenEntitySerializer(serializers.ModelSerializer):
                   'imagingMethods', 'sampleType', 'dataDoi', 'plateCount', 'plates']
 
     def get_plates(self, obj):
-
-        # Get ligand ID and list of IDs tuples from queryset context to pass it to PlateEntitySerializer
-        context = self.context
-        ligand_entity = self.context.get('ligand_entity')
-        zip_list = self.context.get('zip_list')
-
-        # Given the ligand ID, get the list of PlateEntities that include well(s) associated to that ligand and get the unique list
-        if ligand_entity:
-            plateid_list = []
-            for tupl in zip_list:
-                if tupl[2] == obj.dbId:  # tupl[2] = ScreenEntity id
-                    plateid_list.append(tupl[3])  # tupl[3] = PlateEntity id
-
-            unique_plateid_list = list(set(plateid_list))
-
-            # Given the unique list of Plate IDs, get queryset including all PlateEntity models and pass it to PlateEntitySerializer
-            plate_qs = PlateEntity.objects.filter(dbId__in=unique_plateid_list)
-            return PlateEntitySerializer(many=True,  context=context).to_representation(plate_qs)
+        # Plates of the screen including well(s) associated to the ligand
+        evidence = self.context.get('idr_evidence')
+        if evidence is not None:
+            return PlateEntitySerializer(many=True, context=self.context).to_representation(
+                evidence.getPlates(obj))
 
 
 class AssayEntitySerializer(serializers.ModelSerializer):
@@ -149,36 +131,17 @@ class AssayEntitySerializer(serializers.ModelSerializer):
                   'externalLink', 'releaseDate', 'publications', 'dataDoi', 'BIAId', 'screenCount', 'screens', 'additionalAnalyses']
 
     def get_screens(self, obj):
-
-        # Get ligand ID and list of IDs tuples from queryset context to pass it to ScreenEntitySerializer
-        context = self.context
-        ligand_entity = self.context.get('ligand_entity')
-        zip_list = self.context.get('zip_list')
-
-        # Given the ligand ID, get the list of ScreenEntities that include well(s) associated to that ligand and get the unique list
-        if ligand_entity:
-            screenid_list = []
-            for tupl in zip_list:
-                if tupl[1] == obj.dbId:  # tupl[1] = AssayEntity id
-                    screenid_list.append(tupl[2])  # tupl[2] = ScreenEntity id
-
-            unique_screenid_list = list(set(screenid_list))
-
-            # Given the unique list of Screen IDs, get queryset including all ScreenEntity models and pass it to ScreenEntitySerializer
-            screen_qs = ScreenEntity.objects.filter(
-                dbId__in=unique_screenid_list)
-            return ScreenEntitySerializer(many=True,  context=context).to_representation(screen_qs)
+        # Screens of the assay including well(s) associated to the ligand
+        evidence = self.context.get('idr_evidence')
+        if evidence is not None:
+            return ScreenEntitySerializer(many=True, context=self.context).to_representation(
+                evidence.getScreens(obj))
 
     def get_additionalAnalyses(self, obj):
-
-        # Get ligand ID from queryset context
-        context = self.context
-        ligand_entity = self.context.get('ligand_entity')
-
-        # Given the assay and the ligand id, get queryset including all control wells and pass it to WellEntitySerializer
-        analyses_qs = Analyses.objects.filter(
-            assay_id=obj.dbId).filter(ligand=ligand_entity)
-        return AnalysesSerializer(many=True).to_representation(analyses_qs)
+        # Additional analyses of the ligand in this assay
+        evidence = self.context.get('idr_evidence')
+        analyses = evidence.getAnalyses(obj) if evidence else []
+        return AnalysesSerializer(many=True).to_representation(analyses)
 
 
 class FeatureTypeIDRSerializer(serializers.ModelSerializer):
@@ -190,24 +153,11 @@ class FeatureTypeIDRSerializer(serializers.ModelSerializer):
                   'description', 'externalLink', 'assays']
 
     def get_assays(self, obj):
-        # Get ligand ID and list of IDs tuples from queryset context to pass it to AssayEntitySerializer
-        context = self.context
-        ligand_entity = self.context.get('ligand_entity')
-        zip_list = self.context.get('zip_list')
-
-        # Given the ligand ID, get the list of AssayEntities that include well(s) associated to that ligand and get the unique list
-        if ligand_entity:
-            assayid_list1 = []
-            for tupl in zip_list:
-                if tupl[0] == obj.id:  # tupl[0] = FeatureType id
-                    assayid_list1.append(tupl[1])  # tupl[1] = AssayEntity id
-
-            unique_assayid_list = list(set(assayid_list1))
-
-            # Given the unique list of Assay IDs, get queryset including all AssayEntity models and pass it to AssayEntitySerializer
-            assay_qs = AssayEntity.objects.filter(dbId__in=unique_assayid_list)
-
-            return AssayEntitySerializer(many=True,  context=context).to_representation(assay_qs)
+        # Assays of the feature type including well(s) associated to the ligand
+        evidence = self.context.get('idr_evidence')
+        if evidence is not None:
+            return AssayEntitySerializer(many=True, context=self.context).to_representation(
+                evidence.getAssays(obj))
 
 
 class RefinedModelMethodSerializer(serializers.ModelSerializer):
@@ -321,47 +271,22 @@ class LigandEntitySerializer(serializers.ModelSerializer):
         depth = 2
 
     def get_imageData(self, obj):
-
-        # Update the queryset context with the ligand ID to pass it to the rest of serializers involved (FeatureTypeIDRSerializer, AssayEntitySerializer, ScreenEntitySerializer, PlateEntitySerializer and WellEntitySerializer)
-        context = self.context
-        context.update({'ligand_entity': obj})
-
-        # Given the wells associated to a specific ligand, get the tuple of all ids associated to each well (FeatureType, AssayEntity, ScreenEntity and PlateEntity ids)
-        featureTypeId_list2, assayEntityId_list2, screenEntityId_list2, plateEntityId_list2, wellEntityId_list2 = [], [], [], [], []
-        if hasattr(obj, 'well'):
-            for well in obj.well.all():
-                featureTypeId_list2.append(
-                    well.plate.screen.assay.featureType_id)
-                assayEntityId_list2.append(well.plate.screen.assay_id)
-                screenEntityId_list2.append(well.plate.screen_id)
-                plateEntityId_list2.append(well.plate_id)
-                wellEntityId_list2.append(well.dbId)
-
-        zip_list = list(zip(
-            featureTypeId_list2,
-            assayEntityId_list2,
-            screenEntityId_list2,
-            plateEntityId_list2,
-            wellEntityId_list2
-        ))
-
-        # Update the queryset context with the the list of tuples including ids associated to a ligand and pass it to the rest of serializers involved (FeatureTypeIDRSerializer, AssayEntitySerializer, ScreenEntitySerializer, PlateEntitySerializer and WellEntitySerializer)
-        context.update({
-            'zip_list': zip_list
-        })
-
-        # Get the unique list of all FeatureType IDs associated to each LigandEntity
-        featureTypeid_list = []
-        for well in zip_list:
-            featureTypeid_list.append(well[0])
-
-        unique_featureTypeid_list = list(set(featureTypeid_list))
-
-        # Given the unique list of FeatureType IDs, get queryset including all FeatureType models and pass it to FeatureTypeIDRSerializer
-        featureType_qs = FeatureType.objects.filter(
-            pk__in=unique_featureTypeid_list)
-
-        return FeatureTypeIDRSerializer(many=True, context=context).to_representation(featureType_qs)
+        # The IDR evidence (FeatureType -> Assay -> Screen -> Plate -> Well) of all
+        # the ligands being serialized is fetched at once, on the first one
+        evidence = self.context.get('idr_page_evidence')
+        if evidence is None or obj.pk not in evidence:
+            ligands = [obj]
+            if isinstance(self.parent, serializers.ListSerializer) and self.parent.instance is not None:
+                ligands = list(self.parent.instance)
+            evidence = getIDREvidence([ligand.pk for ligand in ligands] + [obj.pk])
+            if isinstance(self.context, dict):
+                self.context['idr_page_evidence'] = evidence
+
+        # Pass the evidence tree of the ligand to the rest of serializers involved (FeatureTypeIDRSerializer, AssayEntitySerializer, ScreenEntitySerializer, PlateEntitySerializer and WellEntitySerializer)
+        ligandEvidence = evidence.getLigand(obj.pk)
+        context = dict(self.context, idr_evidence=ligandEvidence)
+        return FeatureTypeIDRSerializer(many=True, context=context).to_representation(
+            ligandEvidence.getFeatureTypes())
 
 
 class PdbLigandSerializer(serializers.ModelSerializer):
@@ -396,9 +321,6 @@ class ModelEntitySerializer(serializers.ModelSerializer):
 
 
 class EntityExportSerializer(serializers.ModelSerializer):
-    isAntibody = serializers.BooleanField
-    isNanobody = serializers.BooleanField
-    isSybody = serializers.BooleanField
     organism = OrganismSerializer(read_only=True)
     uniprotAcc = UniProtEntrySerializer(read_only=True)
 
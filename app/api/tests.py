@@ -1,3 +1,82 @@
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from . import generations
+from .models import *
+
+NO_RESPONSE_CACHE = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "responses": {
+        "BACKEND": "django.core.cache.backends.dummy.DummyCache",
+    },
+}
+
+
+@override_settings(CACHES=NO_RESPONSE_CACHE)
+class PdbEntryQueryBudgetTest(TestCase):
+    '''
+        /pdbentry/ must cost a constant number of queries, whatever the
+        number of entries in the page
+    '''
+    MAX_QUERIES = 15
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.source = RefinedModelSource.objects.create(name='PDB-REDO')
+        cls.method = RefinedModelMethod.objects.create(
+            source=cls.source, name='PDB-Redo')
+        cls.organism = Organism.objects.create(
+            ncbi_taxonomy_id='2697049', scientific_name='SARS-CoV-2')
+        cls.uniprot = UniProtEntry.objects.create(dbId='P0DTD1', name='R1AB')
+        NMRTargetToPoliprotein.objects.create(
+            uniprotentry=cls.uniprot, targetName='NSP1', start=1, end=180)
+
+    def createEntry(self, idx):
+        pdb_id = '%sabc' % idx
+        entry = PdbEntry.objects.create(dbId=pdb_id, title='Entry %s' % idx)
+        entity = ModelEntity.objects.create(
+            uniprotAcc=self.uniprot, organism=self.organism, name='Entity %s' % idx)
+        PdbToEntity.objects.create(pdbId=entry, entity=entity, chain_id='A')
+        ligand = LigandEntity.objects.create(
+            IUPACInChIkey='LIGAND-%s' % idx, name='Ligand %s' % idx)
+        PdbToLigand.objects.create(pdbId=entry, ligand=ligand, quantity=1)
+        emdb = EmdbEntry.objects.create(dbId='EMD-1000%s' % idx, title='Map %s' % idx)
+        HybridModel.objects.create(pdbId=entry, emdbId=emdb)
+        RefinedModel.objects.create(
+            pdbId=entry, source=self.source, method=self.method,
+            filename='%s_final.cif' % pdb_id)
+        author = Author.objects.create(name='Author %s' % idx)
+        PdbEntryAuthor.objects.create(pdbId=entry, author=author, ordinal=1)
+        publication = Publication.objects.create(title='Publication %s' % idx)
+        PublicationAuthor.objects.create(
+            publication=publication, author=author, ordinal=1)
+        sample = SampleEntity.objects.create(name='Sample %s' % idx)
+        details = PdbEntryDetails.objects.create(pdbentry=entry, sample=sample)
+        details.refdoc.add(publication)
+        return entry
+
+    def countQueries(self, url):
+        # the data generations are read again from the DB
+        generations.invalidate()
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_list_queries_do_not_grow_with_entries(self):
+        self.createEntry(1)
+        oneEntry = self.countQueries('/api/pdbentry/')
+        for idx in range(2, 10):
+            self.createEntry(idx)
+        manyEntries = self.countQueries('/api/pdbentry/')
+        self.assertEqual(oneEntry, manyEntries)
+        self.assertLessEqual(manyEntries, self.MAX_QUERIES)
+
+    def test_retrieve_query_budget(self):
+        for idx in range(1, 4):
+            self.createEntry(idx)
+        self.assertLessEqual(self.countQueries('/api/pdbentry/2abc/'), self.MAX_QUERIES)
@@ -23,9 +23,23 @@ urlpatterns = [
     re_path(r"^version/$", views.GetApiVersion.as_view()),
     # EM Validation annotations for 3DBionotes - Protvista
     re_path(
-        r"^pdbAnnotFromMap/all/(?P<pdb_id>\d\w{3})/(?P<chain_id>\w{1})/?(?P<modified_model>(pdb-redo|isolde))?/$",
+        r"^pdbAnnotFromMap/all/(?P<pdb_id>\d\w{3})/(?P<chain_id>(\w{1}|\*))/?(?P<modified_model>(pdb-redo|isolde))?/$",
         views.PdbEntryAllAnnFromMapView.as_view(),
     ),
+    # all chains
+    re_path(
+        r"^pdbAnnotFromMap/all/(?P<pdb_id>\d\w{3})/?(?P<modified_model>(pdb-redo|isolde))?/$",
+        views.PdbEntryAllAnnFromMapView.as_view(),
+    ),
+    re_path(
+        r"^pdbAnnotFromMap/batch/$",
+        views.PdbEntryAnnFromMapBatchView.as_view(),
+    ),
+    re_path(
+        r"^emv/jobs/(?P<job_id>[0-9a-f-]{36})/$",
+        views.EmvJobView.as_view(),
+        name='emv-job',
+    ),
     # Validation annotations for FunPDBe
     re_path(r"^funpdbe/$", views.FunPDBeEntryListView.as_view()),
     re_path(
@@ -88,6 +102,10 @@ urlpatterns = [
         r"^emv/(?P<db_id>(\d[a-zA-Z]\w{2}|[EMD]*[emd]*-\d{4,5}))/mapq/averages/$",
         views.EmvMapQDataAveragesView.as_view(),
     ),
+    re_path(
+        r"^emv/mapq/averages/$",
+        views.EmvMapQDataAveragesBulkView.as_view(),
+    ),
     re_path(
         r"^emv/(?P<db_id>(\d[a-zA-Z]\w{2}|[EMD]*[emd]*-\d{4,5}))/localresolution/consensus/$",
         views.EmvDataLocalresConsensus.as_view(),
@@ -96,6 +114,14 @@ urlpatterns = [
         r"^emv/(?P<db_id>(\d[a-zA-Z]\w{2}|[EMD]*[emd]*-\d{4,5}))/localresolution/rank/$",
         views.EmvDataLocalresRank.as_view(),
     ),
+    re_path(
+        r"^emv/localresolution/rank/$",
+        views.EmvDataLocalresRanksView.as_view(),
+    ),
+    re_path(
+        r"^emv/localresolution/histogram/$",
+        views.EmvDataLocalresHistogramView.as_view(),
+    ),
     # Ontology related endpoints
     re_path(r"^ontologies/$", views.OntologyViewSet.as_view({"get": "list"})),
     re_path(r"^ontologies/terms/$",
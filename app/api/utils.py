@@ -5,10 +5,11 @@ import logging
 import os
 import re
 from subprocess import check_output
-from django.core.exceptions import ValidationError
 from api.study_parser import StudyParser
 from .dataPaths import *
 from .models import *
+from .annotations import ANN_TYPES_DICT, ANN_TYPES_MIN_VAL, getAnnotationStore, \
+    getAnnotationFileTypes, findAnnotationFile
 import requests
 import fnmatch
 from Bio.PDB import MMCIF2Dict
@@ -328,49 +329,48 @@ def findGeneric(pattern, dirToLook=THORN_DATA_DIR):
 
 class PdbEntryAnnFromMapsUtils(object):
 
-    def _getJsonFromFname(self, fneme, chain_id, minToFilter=-1):
-        residues = []
-        values = []
-        with open(fneme) as f:
-            for line in f:
-                if not "CA" in line or not "ATOM" in line:
-                    continue
-                chainId = line[21]
-                if chainId != chain_id:
+    def _getAnnotations(self, pdb_id, chain_ids, modified_model=None,
+                        segments=False, step=0):
+        """
+        Map derived annotations of several chains (all if chain_ids is None)
+        of a PDB entry, reading each annotation file once.
+        With segments, runs of residues with the same value (quantized to
+        step) are merged in {"begin", "end", "value"} ranges.
+        Returns {chain_id: [algoDataDict, ...]}
+        """
+        annotations = {chain_id: [] for chain_id in chain_ids or []}
+        if modified_model is not None:
+            pdb_id = pdb_id + "." + modified_model
+        for algFamily in ANN_TYPES_DICT:
+            for algoName in ANN_TYPES_DICT[algFamily]:
+                modifiedPdbFname = ANN_TYPES_DICT[algFamily][algoName] % {
+                    "pdb_id": pdb_id
+                }
+                modifiedPdbFname = self._locateFname(
+                    modifiedPdbFname, modifiedPdbType=modified_model)
+                if modifiedPdbFname is None:
                     continue
-                resId = line[22:26].strip()
-                bFactor = float(line[54:60].strip())
-                residues.append({"begin": resId, "value": bFactor})
-                values.append(bFactor)
-        if len(residues) == 0:
-            return None
-        return {"chain": chain_id, "data": residues, "minVal": min([val for val in values if val > minToFilter]), "maxVal": max(values)}
+                store = getAnnotationStore(
+                    modifiedPdbFname, ANN_TYPES_MIN_VAL[algFamily][algoName])
+                for chain_id in chain_ids or store.chainIds():
+                    algoDataDict = store.getChainJson(chain_id, segments, step)
+                    if algoDataDict is not None:
+                        algoDataDict["algorithm"] = algoName
+                        algoDataDict["algoType"] = algFamily
+                        annotations.setdefault(chain_id, []).append(algoDataDict)
+        return annotations
 
     def _locateFname(self, targetFname, modifiedPdbType=None):
 
-        try:
-            logger.debug("Searching %s in DB", targetFname)
-            fileRecord = DataFile.objects.get(
-                filename__iexact=targetFname, fileType__iexact=ENTRY_TYPES[0])
-            if fileRecord:
-                return os.path.join(fileRecord.path, fileRecord.filename)
-            else:
-                logger.debug("Not found %s in DB", targetFname)
-                return None
-        except (ValueError, ValidationError, DataFile.DoesNotExist) as exc:
-            logger.exception(exc)
-            # check from disk
-            logger.debug("Searching %s in Disk", targetFname)
-
-            if modifiedPdbType is None:
-                rootDir = EMDB_DATA_DIR
-            else:
-                rootDir = os.path.join(MODIFIED_PDBS_ANN_DIR, modifiedPdbType)
-            for dirName in os.listdir(rootDir):
-                for fname in os.listdir(os.path.join(rootDir, dirName)):
-                    if fname == targetFname:
-                        return os.path.join(rootDir, dirName, fname)
-        return None
+        logger.debug("Searching %s in DB", targetFname)
+        fileRecord = DataFile.objects.filter(
+            filename__iexact=targetFname,
+            fileType__in=getAnnotationFileTypes(modifiedPdbType)).first()
+        if fileRecord:
+            return os.path.join(fileRecord.path, fileRecord.filename)
+        # not registered yet, check the file index
+        logger.debug("Searching %s in file index", targetFname)
+        return findAnnotationFile(targetFname)
 
 # ========== ========== ========== ========== ========== ========== ==========
 
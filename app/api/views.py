@@ -1,16 +1,28 @@
-from datetime import datetime, timezone
+from datetime import datetime
 from itertools import chain
-from pathlib import Path
-import glob
+from collections import OrderedDict
 import re
-import json
-import csv
 import logging
-import requests
 from django.http import HttpResponse, HttpResponseNotFound
 from .serializers import *
 from .models import *
 from .utils import PdbEntryAnnFromMapsUtils
+from .annotations import MODIFIED_MODEL_TYPES
+from .caches import loadJsonFile
+from .emv_catalog import getEmvCatalogFiles
+from .mappings import getEmdbMappings
+from .funpdbe import getFunPDBeIndex
+from .renderers import getResidueRendererClasses, isBinaryRendered
+from .response_cache import CachedResponseMixin, CachedWritableMixin
+from .lookups import getRefinedModelMethodId
+from .search import SearchResults
+from .emv_jobs import requestEmvJob
+from . import daq
+from .responses import fileResponse, jsonFileResponse, getContentType, \
+    getFilesETag, getFilesLastModified, isNotModified, notModifiedResponse, setValidators
+from .emv_stats import getQScoreAverages, getQScoreAveragesDate, \
+    LOCALRES_HISTORY_FILE, getLocalResRank, getLocalResRanks, getLocalResHistogram
+from bws.pagination import StandardResultsSetPagination, SortedListCursorPagination
 from rest_framework import status, viewsets, permissions, mixins
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -20,7 +32,8 @@ from django_filters import rest_framework as filters
 from rest_framework.renderers import JSONRenderer
 from datetime import datetime
 from django.shortcuts import get_object_or_404
-from django.db.models import Case, When, Value, BooleanField
+from django.urls import reverse
+from django.db.models import Prefetch
 from haystack.query import SearchQuerySet
 import time
 
@@ -30,37 +43,15 @@ HTTP_TIMEOUT = 15
 REGEX_PDB_ID = re.compile(r'^\d\w{3}$')
 REGEX_EMDB_ID = re.compile(r'^emd-\d{5}$')
 REGEX_CHAIN_ID = re.compile(r'^\w{1,2}$')
-DEEP_RES_FNAME_TEMPLATE = "%(pdb_id)s.deepres.aa.pdb"
-MONORES_FNAME_TEMPLATE = "%(pdb_id)s.monores.aa.pdb"
-BLOCRES_FNAME_TEMPLATE = "%(pdb_id)s.blocres.aa.pdb"
-MAPQ_FNAME_TEMPLATE = "%(pdb_id)s.mapq.aa.pdb"
-DAQ_FNAME_TEMPLATE = "%(pdb_id)s.daq.aa.pdb"
-FSCQ_TEMPLATE = "%(pdb_id)s.fscq.aa.pdb"
-LOCALRES_HISTORY_FILE = 'emv_localResolution_stats.csv'
-ANN_TYPES_DICT = {
-    "localResolution": {
-        "deepres": DEEP_RES_FNAME_TEMPLATE,
-        "monores": MONORES_FNAME_TEMPLATE,
-        "blocres": BLOCRES_FNAME_TEMPLATE
-    },
-    "modelQuality": {
-        "mapq": MAPQ_FNAME_TEMPLATE,
-        "fscq": FSCQ_TEMPLATE,
-        "daq": DAQ_FNAME_TEMPLATE
-    }
-}
-ANN_TYPES_MIN_VAL = {
-    "localResolution": {
-        "deepres": 1.5,
-        "monores": 1.5,
-        "blocres": 1.5
-    },
-    "modelQuality": {
-        "mapq": -1,
-        "fscq": -3,
-        "daq": -1
-    }
-}
+ALL_CHAINS = '*'
+# ?encoding= of the map derived annotations: one item per residue or per run
+ANN_ENCODINGS = ['residues', 'segments']
+MAX_HISTOGRAM_BINS = 200
+# responses built from data files, which may change with no notice
+EMV_CACHE_TIMEOUT = 10 * 60
+# data domains (see generations.py) of the cached responses
+EMV_DOMAINS = [DATA_EMV]
+ENTRY_DOMAINS = [DATA_STRUCTURES, DATA_REFINED, DATA_NMR, DATA_IDR]
 
 
 def not_found_resp(query_id):
@@ -75,6 +66,23 @@ def validate_param(pattern, value, message):
         content = {"request": value, "detail": full_message}
         return Response(content, status=status.HTTP_400_BAD_REQUEST)
 
+def get_ann_encoding(request):
+    """
+    (segments, step) of the ?encoding=residues|segments&step=<float> params
+    step: quantization of the values merged in segments, 0 for exact values
+    """
+    encoding = request.query_params.get('encoding', ANN_ENCODINGS[0])
+    if encoding not in ANN_ENCODINGS:
+        raise ValueError("Invalid encoding: %s, use one of %s" % (
+            encoding, ", ".join(ANN_ENCODINGS)))
+    try:
+        step = float(request.query_params.get('step', 0))
+    except ValueError:
+        step = -1
+    if not 0 <= step < float('inf'):
+        raise ValueError("Invalid step: %s" % request.query_params.get('step'))
+    return encoding == ANN_ENCODINGS[1], step
+
 def validate_pdb_id(pdb_id):
     return validate_param(REGEX_PDB_ID, pdb_id, "Invalid PDB Entry ID format")
 
@@ -87,77 +95,164 @@ def validate_chain_id(chain_id):
 def raise_if_path_traversal_attempt(path, filepath):
     if not os.path.commonprefix([filepath, path]) == path:
         raise Exception("Path Traversal Attempt")
-class PdbEntryAllAnnFromMapView(APIView, PdbEntryAnnFromMapsUtils):
+class PdbEntryAllAnnFromMapView(CachedResponseMixin, APIView, PdbEntryAnnFromMapsUtils):
     """
     Retrieve an annotation entry `details`.
     """
+    cache_domains = EMV_DOMAINS
+    cache_timeout = EMV_CACHE_TIMEOUT
+    renderer_classes = getResidueRendererClasses()
 
-    def get(self, request, pdb_id, chain_id, modified_model=None, format=None):
+    def get(self, request, pdb_id, chain_id=None, modified_model=None, format=None):
         """
         Get all map derived annotations related to one pdb_id, chain_id
+        chain_id : <optional> all chains, grouped by chain, if missing or '*'
+        ?encoding=segments : runs of residues with the same value as
+            {"begin", "end", "value"}, values quantized to ?step= if given
         """
         pdb_id = pdb_id.lower()
         if response := validate_pdb_id(pdb_id):
             return response
+        try:
+            segments, step = get_ann_encoding(request)
+        except ValueError as exc:
+            content = {"request": request.path, "detail": str(exc)}
+            return Response(content, status=status.HTTP_400_BAD_REQUEST)
+        if chain_id in (None, ALL_CHAINS):
+            return self.getAllChains(request, pdb_id, modified_model, segments, step)
         if response := validate_chain_id(chain_id):
             return response
-        responseData = []
+        responseData = self._getAnnotations(
+            pdb_id, [chain_id], modified_model, segments, step)[chain_id]
         if modified_model is not None:
             pdb_id = pdb_id + "." + modified_model
-        for algFamily in ANN_TYPES_DICT:
-            for algoName in ANN_TYPES_DICT[algFamily]:
-                modifiedPdbFname = ANN_TYPES_DICT[algFamily][algoName] % {
-                    "pdb_id": pdb_id
-                }
-                modifiedPdbFname = self._locateFname(
-                    modifiedPdbFname, modifiedPdbType=modified_model)
-                if modifiedPdbFname is not None:
-                    algoDataDict = self._getJsonFromFname(
-                        modifiedPdbFname,
-                        chain_id,
-                        minToFilter=ANN_TYPES_MIN_VAL[algFamily][algoName])
-                    if algoDataDict is not None:
-                        algoDataDict["algorithm"] = algoName
-                        algoDataDict["algoType"] = algFamily
-                        responseData.append(algoDataDict)
 
         if len(responseData) == 0:
             logger.debug("Not found %s", pdb_id + "/" + chain_id)
             #   Request EMV WebService to calculate the EMV scores
-            #   This is an asyncronous call for computation. User must query again in the future to get results
-            q_path = EMV_WS_URL + "/" + EMV_WS_PATH + "/" + pdb_id + "/" + chain_id + "/"
-            logger.debug(
-                "Requesting EMV WebService to calculate the EMV scores %s",
-                q_path)
+            #   The computation is queued once, and done asynchronously by the
+            #   run_emv_jobs worker. User must query again in the future to get results
             try:
-                headers = {'accept': 'application/json'}
-                resp = requests.get(q_path, headers=headers, timeout=(2, 5))
-
-                logger.debug("EMV WS-query: %s", resp.url)
-                logger.debug("WS-response: %s, %s", resp.status_code,
-                             resp.json())
-                if resp:
-                    dresp = HttpResponse(
-                        content=resp.content,
-                        status=resp.status_code,
-                        content_type=resp.headers['Content-Type'])
-                    return dresp
+                job = requestEmvJob(pdb_id.split(".")[0], chain_id, modified_model)
             except Exception as exc:
                 logger.exception(exc)
+                return not_found_resp(pdb_id)
+            if job.status in (JOB_DONE, JOB_FAILED):
+                return not_found_resp(pdb_id)
+            statusUrl = request.build_absolute_uri(
+                reverse('emv-job', kwargs={'job_id': job.unique_id}))
+            content = {
+                "request": pdb_id + "/" + chain_id,
+                "detail": "EMV computation requested, check the job status",
+                "job": EmvJobSerializer(job).data,
+                "statusUrl": statusUrl,
+            }
+            return Response(content, status=status.HTTP_202_ACCEPTED,
+                            headers={'Location': statusUrl})
+
+        return Response(responseData)
 
+
+    def getAllChains(self, request, pdb_id, modified_model=None, segments=False, step=0):
+        """
+        Map derived annotations of all the chains, reading each file once
+        """
+        responseData = self._getAnnotations(
+            pdb_id, None, modified_model, segments, step)
+        if not responseData:
+            if modified_model is not None:
+                pdb_id = pdb_id + "." + modified_model
             return not_found_resp(pdb_id)
+        return Response(responseData)
+
 
+class PdbEntryAnnFromMapBatchView(APIView, PdbEntryAnnFromMapsUtils):
+    """
+    Retrieve the map derived annotations of several PDB entries / chains at once
+    """
+    renderer_classes = getResidueRendererClasses()
+    MAX_ITEMS = 500
+
+    def _parseItem(self, item):
+        if isinstance(item, dict):
+            pdb_id = item.get("pdb_id", "")
+            chain_id = item.get("chain_id", "")
+            modified_model = item.get("modified_model")
+        elif isinstance(item, (list, tuple)) and 2 <= len(item) <= 3:
+            pdb_id, chain_id = item[0], item[1]
+            modified_model = item[2] if len(item) > 2 else None
+        else:
+            raise ValueError("Invalid item: %s" % (item,))
+        pdb_id = str(pdb_id).lower()
+        chain_id = str(chain_id)
+        modified_model = modified_model or None
+        if not REGEX_PDB_ID.match(pdb_id) or not REGEX_CHAIN_ID.match(chain_id) or (
+                modified_model is not None and modified_model not in MODIFIED_MODEL_TYPES):
+            raise ValueError("Invalid item: %s" % (item,))
+        return pdb_id, chain_id, modified_model
+
+    def post(self, request, format=None):
+        """
+        Get all map derived annotations for a list of (pdb_id, chain_id, modified_model)
+        Body: {"entries": [{"pdb_id": "7ey8", "chain_id": "A", "modified_model": null}, ...]}
+            items can also be lists: ["7ey8", "A"] or ["7ey8", "A", "pdb-redo"]
+        ?encoding=segments&step= as in /pdbAnnotFromMap/all/
+        """
+        items = request.data.get("entries") if isinstance(
+            request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            content = {"request": request.path, "detail": "No entries provided"}
+            return Response(content, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.MAX_ITEMS:
+            content = {"request": request.path,
+                       "detail": "Too many entries, max. %s" % self.MAX_ITEMS}
+            return Response(content, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            items = [self._parseItem(item) for item in items]
+            segments, step = get_ann_encoding(request)
+        except ValueError as exc:
+            content = {"request": request.path, "detail": str(exc)}
+            return Response(content, status=status.HTTP_400_BAD_REQUEST)
+
+        # chains of the same entry are read together
+        chainsByEntry = OrderedDict()
+        for pdb_id, chain_id, modified_model in items:
+            chains = chainsByEntry.setdefault((pdb_id, modified_model), [])
+            if chain_id not in chains:
+                chains.append(chain_id)
+        annotations = {}
+        for (pdb_id, modified_model), chain_ids in chainsByEntry.items():
+            annotations[(pdb_id, modified_model)] = self._getAnnotations(
+                pdb_id, chain_ids, modified_model, segments, step)
+
+        responseData = [{
+            "pdb_id": pdb_id,
+            "chain_id": chain_id,
+            "modified_model": modified_model,
+            "annotations": annotations[(pdb_id, modified_model)][chain_id],
+        } for pdb_id, chain_id, modified_model in items]
         return Response(responseData)
 
 
+class EmvJobView(APIView):
+    """
+    Retrieve the status of an EMV computation job
+    """
+
+    def get(self, request, job_id, format=None):
+        job = get_object_or_404(EmvJob, unique_id=job_id)
+        return Response(EmvJobSerializer(job).data)
+
+
 #  ######################################################################
 
-class RefinedModelMethodViewSet(viewsets.GenericViewSet,
+class RefinedModelMethodViewSet(CachedResponseMixin, viewsets.GenericViewSet,
                                 mixins.ListModelMixin, mixins.RetrieveModelMixin
                                 ):
     """
     This viewset automatically provides `list` and `detail` actions.
     """
+    cache_domains = [DATA_REFINED]
     queryset = RefinedModelMethod.objects.all()
     serializer_class = RefinedModelMethodSerializer
     filter_backends = (filters.DjangoFilterBackend, SearchFilter,
@@ -167,12 +262,13 @@ class RefinedModelMethodViewSet(viewsets.GenericViewSet,
     ordering = ['name']
 
 
-class RefinedModelSourceViewSet(viewsets.GenericViewSet,
+class RefinedModelSourceViewSet(CachedResponseMixin, viewsets.GenericViewSet,
                                 mixins.ListModelMixin, mixins.RetrieveModelMixin
                                 ):
     """
     This viewset automatically provides `list` and `detail` actions.
     """
+    cache_domains = [DATA_REFINED]
     queryset = RefinedModelSource.objects.all()
     serializer_class = RefinedModelSourceSerializer
     filter_backends = (filters.DjangoFilterBackend, SearchFilter,
@@ -182,12 +278,13 @@ class RefinedModelSourceViewSet(viewsets.GenericViewSet,
     ordering = ['name']
 
 
-class RefinedModelViewSet(viewsets.GenericViewSet,
+class RefinedModelViewSet(CachedResponseMixin, viewsets.GenericViewSet,
                           mixins.ListModelMixin, mixins.RetrieveModelMixin
                           ):
     """
     This viewset automatically provides `list` and `detail` actions.
     """
+    cache_domains = [DATA_STRUCTURES, DATA_REFINED]
     renderer_classes = [JSONRenderer]
     queryset = RefinedModel.objects.all()
     serializer_class = RefinedModelSerializer
@@ -205,20 +302,21 @@ class RefinedModelViewSet(viewsets.GenericViewSet,
         if pdbId:
             queryset = queryset.filter(pdbId__exact=pdbId)
         if method_name:
-            method = RefinedModelMethod.objects.filter(name__iexact=method_name).first()
-            if method:
-                queryset = queryset.filter(method__exact=method.id)
+            method_id = getRefinedModelMethodId(method_name)
+            if method_id:
+                queryset = queryset.filter(method__exact=method_id)
         if emdbId:
             queryset = queryset.filter(emdbId__exact=emdbId)
         return queryset
     
 
-class TopicViewSet(viewsets.GenericViewSet,
+class TopicViewSet(CachedResponseMixin, viewsets.GenericViewSet,
                    mixins.ListModelMixin, mixins.RetrieveModelMixin
                    ):
     """
     This viewset automatically provides `list` and `detail` actions.
     """
+    cache_domains = [DATA_STRUCTURES]
     queryset = Topic.objects.all()
     serializer_class = TopicSerializer
     filter_backends = (filters.DjangoFilterBackend, SearchFilter,
@@ -228,12 +326,13 @@ class TopicViewSet(viewsets.GenericViewSet,
     ordering = ['name']
 
 
-class StructureToTopicViewSet(viewsets.GenericViewSet,
+class StructureToTopicViewSet(CachedResponseMixin, viewsets.GenericViewSet,
                               mixins.ListModelMixin, mixins.RetrieveModelMixin
                               ):
     """
     This viewset automatically provides `list` and `detail` actions.
     """
+    cache_domains = [DATA_STRUCTURES]
     queryset = StructureTopic.objects.all()
     serializer_class = StructureTopicSerializer
     filter_backends = (filters.DjangoFilterBackend, SearchFilter,
@@ -247,32 +346,30 @@ class StructureToTopicViewSet(viewsets.GenericViewSet,
     ordering = ['topic']
 
 
-class FunPDBeEntryListView(APIView):
+class FunPDBeEntryListView(CachedResponseMixin, APIView):
     """
     Retrieve a list of all FunPDBe entries.
     """
+    cache_timeout = EMV_CACHE_TIMEOUT
 
     def get(self, request, format=None):
         """
-        Get a list of entries
+        Get a list of entries (cursor paginated)
+        pdb : <optional> PDB ID prefix
         """
-        path = FUNPDBE_DATA_PATH
-        entries = []
+        prefix = request.query_params.get('pdb', '').lower()
+        paginator = SortedListCursorPagination()
         try:
-            logger.debug("Reading data folder: %s", path)
-            for root, dirs, data_files in os.walk(path):
-                for file in data_files:
-                    entries.append({
-                        "entry": {
-                            "pdb": os.path.basename(file).split(".", 1)[0][:4],
-                            "filename": file
-                        }
-                    })
-
-        except (Exception) as exc:
+            index = getFunPDBeIndex()
+            keys, entries = index.keys, index.entries
+            start, end = index.getPrefixRange(prefix)
+        except (OSError, ValueError) as exc:
             logger.exception(exc)
+            keys, entries, start, end = [], [], 0, 0
+        # an invalid cursor is a 404 (NotFound)
+        entries = paginator.paginate_list(request, keys, entries, start, end)
 
-        return Response(entries)
+        return paginator.get_paginated_response(entries)
 
 
 class FunPDBeEntryByPDBView(APIView):
@@ -285,93 +382,32 @@ class FunPDBeEntryByPDBView(APIView):
         if response := validate_pdb_id(pdb_id):
             return response
         path = os.path.join(FUNPDBE_DATA_PATH, pdb_id[1:3])
-        entries = []
         try:
-            logger.debug("Reading data folder: %s", path)
             data_files = [
-                x for x in os.listdir(path)
-                if x.startswith(pdb_id) and x.endswith("-emv.json")
+                (filename, filepath)
+                for filename, filepath in getFunPDBeIndex().getFiles(pdb_id)
+                if filename.startswith(pdb_id) and filename.endswith("-emv.json")
+                and os.path.dirname(filepath) == path
             ]
 
             if not data_files:
                 return not_found_resp(pdb_id)
 
-            for file in data_files:
-                entries.append({
-                    "entry": {
-                        "pdb": os.path.basename(data_files[0]).split(".",
-                                                                     1)[0],
-                        "filename": file
-                    }
-                })
-
-            filepath = os.path.join(path, data_files[0])
+            filepath = data_files[0][1]
             raise_if_path_traversal_attempt(path, filepath)
-            with open(filepath) as json_file:
-                data = json.load(json_file)
+            return jsonFileResponse(request, filepath)
 
         except (Exception) as exc:
             logger.exception(exc)
             return not_found_resp(pdb_id)
 
-        return Response(data)
-
-
-def getEmdbMappings(pdb_id):
-    """
-    Find all PDB models fitted in a volume map, by EMDB ID
-    Use the 3DBionotes API:
-        https://3dbionotes.cnb.csic.es/api/mappings/PDB/EMDB/7a02/
-    """
-
-    pdb_id = pdb_id.lower()
-    # Validate pdb_id to prevent SSRF
-    if not re.match(REGEX_PDB_ID, pdb_id):
-        raise ValueError("Invalid pdb_id format")
-    url = BIONOTES_URL + "/" + MAPPINGS_WS_PATH + "/PDB/EMDB/" + pdb_id
-    logger.debug("Check Bionotes WS for EMDB mappings for %s", pdb_id)
-    logger.debug("WS-qry: %s", url)
-    try:
-        headers = {'accept': 'application/json'}
-        resp = requests.get(url, headers=headers, timeout=(HTTP_TIMEOUT))
-        jresp = resp.json()
-
-        logger.debug("WS-response: %s, %s", resp.status_code, jresp)
-        if not resp.status_code == 200:
-            return []
-        return jresp[pdb_id]
-
-    except Exception as exc:
-        logger.exception(exc)
-
-
-def getPdbMappings(emdb_id):
-    """
-    Find all EMDB volume maps with fitted atomic models, by PDB ID
-    Use the 3DBionotes API:
-        https://3dbionotes.cnb.csic.es/api/mappings/EMDB/PDB/EMD-2810
-    """
-    url = BIONOTES_URL + "/" + MAPPINGS_WS_PATH + "/EMDB/PDB/" + emdb_id
-    logger.debug("Check Bionotes WS for PDB mappings for %s", emdb_id)
-    logger.debug("WS-qry: %s", url)
-    try:
-        headers = {'accept': 'application/json'}
-        resp = requests.get(url, headers=headers, timeout=(2, 5))
-        jresp = resp.json()
-
-        logger.debug("WS-response: %s, %s", resp.status_code, jresp)
-        if not resp.status_code == 200:
-            return []
-        return jresp[emdb_id]
 
-    except Exception as exc:
-        logger.exception(exc)
-
-class FunPDBeEntryByPDBMethodView(APIView):
+class FunPDBeEntryByPDBMethodView(CachedResponseMixin, APIView):
     """
     Retrieve a JSON file with EMV validation data for the PDB entry
     by validation method
     """
+    cache_timeout = EMV_CACHE_TIMEOUT
 
     def get(self, request, pdb_id, method, format=None):
         pdb_id = pdb_id.lower()
@@ -405,26 +441,27 @@ class FunPDBeEntryByPDBMethodView(APIView):
         return Response(status=status.HTTP_404_NOT_FOUND)
 
 
-class SampleEntitySet(viewsets.GenericViewSet,
+class SampleEntitySet(CachedResponseMixin, viewsets.GenericViewSet,
                       mixins.ListModelMixin, mixins.RetrieveModelMixin
                       ):
     """
     This viewset automatically provides `list` and `detail` actions.
     """
+    cache_domains = ENTRY_DOMAINS
     renderer_classes = [JSONRenderer]
     queryset = SampleEntity.objects.all()
     serializer_class = SampleEntitySerializer
 
 
-class LigandEntityViewSet(viewsets.GenericViewSet,
+class LigandEntityViewSet(CachedResponseMixin, viewsets.GenericViewSet,
                           mixins.ListModelMixin, mixins.RetrieveModelMixin
                           ):
     """
     This viewset automatically provides `list` and `detail` actions.
     """
-    # queryset = LigandEntity.objects.all()
-    queryset = LigandEntity.objects.prefetch_related(
-        "well__plate__screen__assay")
+    cache_domains = ENTRY_DOMAINS
+    # the IDR evidence (wells) of the page is fetched by LigandEntitySerializer
+    queryset = LigandEntity.objects.all()
     serializer_class = LigandEntitySerializer
     search_fields = [
         'dbId',
@@ -442,12 +479,13 @@ class LigandEntityViewSet(viewsets.GenericViewSet,
     ordering = ['ligandType', 'IUPACInChIkey']
 
 
-class PdbLigandViewSet(viewsets.GenericViewSet,
+class PdbLigandViewSet(CachedResponseMixin, viewsets.GenericViewSet,
                        mixins.ListModelMixin, mixins.RetrieveModelMixin
                        ):
     """
     This viewset automatically provides `list` and `detail` actions.
     """
+    cache_domains = ENTRY_DOMAINS
     renderer_classes = [JSONRenderer]
     queryset = PdbToLigand.objects.all()
     serializer_class = PdbLigandSerializer
@@ -469,54 +507,44 @@ class PdbEntryFilter(filters.FilterSet):
         fields = ['is_antibody', 'is_nanobody', 'is_sybody', 'is_idr', 'is_pdb_redo', 'is_ceres', 'is_nmr']
 
     def filter_by_is_antibody(self, queryset, name, value):
-        kwords = ['antibody', 'antibodies', 'fab', 'heavy', 'light']
-        case_expression = self.create_case_expression(kwords)
-        return queryset.annotate(is_antibody=case_expression).filter(is_antibody=value).distinct()
+        return self.filter_by_entity_flag(queryset, 'isAntibody', value)
 
     def filter_by_is_nanobody(self, queryset, name, value):
-        kwords = ['nanobody', 'nanobodies', 'nonobody']
-        case_expression = self.create_case_expression(kwords)
-        return queryset.annotate(is_nanobody=case_expression).filter(is_nanobody=value).distinct()
+        return self.filter_by_entity_flag(queryset, 'isNanobody', value)
 
     def filter_by_is_sybody(self, queryset, name, value):
-        kwords = ['synthetic nanobody', 'sybody', 'sybodies']
-        case_expression = self.create_case_expression(kwords)
-        return queryset.annotate(is_sybody=case_expression).filter(is_sybody=value).distinct()
-    
+        return self.filter_by_entity_flag(queryset, 'isSybody', value)
+
     def filter_by_is_pdb_redo(self, queryset, name, value):
-        pdb_redo_source = RefinedModelSource.objects.get(name='PDB-REDO')
-        pdb_redo_models = RefinedModel.objects.filter(pdbId=models.OuterRef('pk'), source=pdb_redo_source)
-        return queryset.annotate(has_pdb_redo=models.Exists(pdb_redo_models)).filter(has_pdb_redo=value)
+        return self.filter_by_availability(queryset, 'isPdbRedo', value)
 
     def filter_by_is_ceres(self, queryset, name, value):
-        ceres_source = RefinedModelSource.objects.get(name='CERES')
-        ceres_models = RefinedModel.objects.filter(pdbId=models.OuterRef('pk'), source=ceres_source)
-        return queryset.annotate(has_ceres=models.Exists(ceres_models)).filter(has_ceres=value)
-    
+        return self.filter_by_availability(queryset, 'isCeres', value)
+
     def filter_by_is_idr(self, queryset, name, value):
-        ligand_well_exists = models.Exists(LigandEntity.objects.filter(pdbentry=models.OuterRef('pk'), well__isnull=False))
-        return queryset.annotate(has_ligand_well=ligand_well_exists).filter(has_ligand_well=value)
-        
+        return self.filter_by_availability(queryset, 'isIdr', value)
+
     def filter_by_is_nmr(self, queryset, name, value):
-        has_nmr = models.Exists(ModelEntity.objects.filter(pdbentry=models.OuterRef('pk'), uniprotAcc__uniprotentities__isnull=False))
-        return queryset.annotate(is_nmr=has_nmr).filter(is_nmr=value).distinct()
-
-    def create_case_expression(self, kwords):
-        case_expression = Case(
-            *[When(entities__name__icontains=word, then=Value(True)) for word in kwords],
-            *[When(entities__details__icontains=word, then=Value(True)) for word in kwords],
-            *[When(entities__altNames__icontains=word, then=Value(True)) for word in kwords],
-            default=Value(False),
-            output_field=BooleanField()
-        )
-        return case_expression
+        return self.filter_by_availability(queryset, 'isNmr', value)
 
-    
+    def filter_by_availability(self, queryset, flag, value):
+        # PdbEntryAvailability, entries without a row yet have nothing available
+        if value:
+            return queryset.filter(**{'availability__' + flag: True})
+        return queryset.exclude(**{'availability__' + flag: True})
+
+    def filter_by_entity_flag(self, queryset, flag, value):
+        # entries with (or without) any entity classified as flag (ModelEntity.classify)
+        has_flag = models.Exists(PdbToEntity.objects.filter(
+            pdbId=models.OuterRef('pk'), **{'entity__' + flag: True}))
+        return queryset.filter(has_flag if value else ~has_flag)
 
-class ModelEntityViewSet(viewsets.GenericViewSet, mixins.ListModelMixin, mixins.RetrieveModelMixin):
+
+class ModelEntityViewSet(CachedResponseMixin, viewsets.GenericViewSet, mixins.ListModelMixin, mixins.RetrieveModelMixin):
     """
     This viewset automatically provides `list` and `detail` actions.
     """
+    cache_domains = ENTRY_DOMAINS
     renderer_classes = [JSONRenderer]
     queryset = ModelEntity.objects.all()
     serializer_class = ModelEntitySerializer
@@ -525,10 +553,11 @@ class ModelEntityViewSet(viewsets.GenericViewSet, mixins.ListModelMixin, mixins.
     ordering = ['pdbId']
 
 
-class PdbEntryViewSet(viewsets.ReadOnlyModelViewSet):
+class PdbEntryViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """
     This viewset automatically provides `list` and `detail` actions.
     """
+    cache_domains = ENTRY_DOMAINS
     serializer_class = PdbEntryExportSerializer
     filter_backends = (filters.DjangoFilterBackend, OrderingFilter)
     filterset_class = PdbEntryFilter
@@ -536,13 +565,61 @@ class PdbEntryViewSet(viewsets.ReadOnlyModelViewSet):
     ordering_fields = ['dbId', 'title', 'relDate', 'emdbs__dbId']
     ordering = ['-relDate']
 
-    def get_queryset(self):
+    def get_search_query_set(self):
         query = self.request.GET.get('q', '')
         if query:
-            search_results = SearchQuerySet().models(PdbEntry).filter_and(content=query)
-            return PdbEntry.objects.filter(dbId__in=[result.pk for result in search_results])
+            return SearchQuerySet().models(PdbEntry).filter_and(content=query)
+        return None
+
+    def get_queryset(self):
+        search_results = self.get_search_query_set()
+        if search_results is not None:
+            queryset = PdbEntry.objects.filter(
+                dbId__in=list(search_results.values_list('pk', flat=True)))
         else:
-            return PdbEntry.objects.all()
+            queryset = PdbEntry.objects.all()
+        return self.prefetch_export_relations(queryset)
+
+    def is_search_paged(self):
+        # the filters and the ordering are applied by the DB to all the hits
+        params = set(self.filterset_fields) | {OrderingFilter.ordering_param}
+        return not params.intersection(self.request.GET)
+
+    def list(self, request, *args, **kwargs):
+        search_results = self.get_search_query_set()
+        if search_results is None or not self.is_search_paged():
+            return super().list(request, *args, **kwargs)
+        # page, total and relevance order from the search engine,
+        # only the rows of the page from the DB
+        results = SearchResults(
+            search_results, self.prefetch_export_relations(PdbEntry.objects.all()))
+        page = self.paginate_queryset(results)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(results[0:results.count()], many=True)
+        return Response(serializer.data)
+
+    @staticmethod
+    def prefetch_export_relations(queryset):
+        """
+        Fetch everything PdbEntryExportSerializer follows with one query per
+        relation, whatever the number of entries in the page
+        """
+        return queryset.prefetch_related(
+            Prefetch('entities', queryset=ModelEntity.objects.select_related(
+                'uniprotAcc', 'organism').prefetch_related('uniprotAcc__uniprotentities')),
+            # only the well IDs are serialized
+            Prefetch('ligands', queryset=LigandEntity.objects.prefetch_related(
+                Prefetch('well', queryset=WellEntity.objects.only('dbId', 'ligand')))),
+            'emdbs',
+            Prefetch('refModels', queryset=RefinedModel.objects.select_related(
+                'source', 'method')),
+            'dbauthors',
+            Prefetch('details', queryset=PdbEntryDetails.objects.select_related(
+                'sample').prefetch_related(
+                Prefetch('refdoc', queryset=Publication.objects.prefetch_related('authors')))),
+        )
 
     def retrieve(self, request, *args, **kwargs):
         queryset = self.get_queryset()
@@ -574,7 +651,8 @@ class AutocompleteAPIView(APIView):
                 'results': []
             })
 
-class LigandsSectionViewSet(viewsets.ReadOnlyModelViewSet):
+class LigandsSectionViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
+    cache_domains = ENTRY_DOMAINS
     serializer_class = LigandEntitySerializer
 
     def get_queryset(self, **kwargs):
@@ -584,15 +662,15 @@ class LigandsSectionViewSet(viewsets.ReadOnlyModelViewSet):
         pdb_ligands = PdbToLigand.objects.filter(pdbId__dbId__iexact=pdb_id)
 
         # Use PdbToLigand entries to filter LigandEntity
-        queryset = LigandEntity.objects.filter(pdbligands__in=pdb_ligands).prefetch_related(
-            "well__plate__screen__assay"
-        )
+        # (the IDR evidence is fetched for the whole page by LigandEntitySerializer)
+        queryset = LigandEntity.objects.filter(pdbligands__in=pdb_ligands)
 
         return queryset
 
 
-class EntitiesSectionViewSet(viewsets.ReadOnlyModelViewSet):
+class EntitiesSectionViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
 
+    cache_domains = ENTRY_DOMAINS
     serializer_class = EntityExportSerializer
 
     def get_queryset(self, **kwargs):
@@ -606,17 +684,6 @@ class EntitiesSectionViewSet(viewsets.ReadOnlyModelViewSet):
         return queryset
 
 
-def _getEmvDataFiles(path, pattern):
-    data_files = []
-    logger.debug("Reading data folder: %s", path)
-    try:
-        search_path = "%s/%s" % (path, pattern)
-        data_files = glob.glob(search_path, recursive=True)
-    except (Exception) as exc:
-        logger.exception(exc)
-    return data_files
-
-
 def _getJsonEMVEntry(file):
     fname = os.path.basename(file)
     fnameparts = fname.split("_")
@@ -633,45 +700,49 @@ def _getJsonEMVEntry(file):
     }
 
 
-class EmvDataView(APIView):
+def _getEmvEntriesResponse(request, view, data_files):
+    """
+    Paginated list of EMV entries from a queryset of catalog files
+    """
+    paginator = StandardResultsSetPagination()
+    page = paginator.paginate_queryset(data_files, request, view=view)
+    entries = [_getJsonEMVEntry(data_file.path) for data_file in page]
+    return paginator.get_paginated_response(entries)
+
+
+class EmvDataView(CachedResponseMixin, APIView):
 
     renderer_classes = [JSONRenderer]
+    cache_domains = EMV_DOMAINS
+    cache_timeout = EMV_CACHE_TIMEOUT
 
     def get(self, request, **kwargs):
         """
         Get a list of all EMV entries
         """
-        data_files = []
-        entries = []
-        data_files = _getEmvDataFiles(path="%s/%s" % (EMV_DATA_DIR, 'emd-*'),
-                                      pattern='*emv_*.json')
-        for file in data_files:
-            entries.append(_getJsonEMVEntry(file))
-        if entries:
-            return Response(entries)
+        data_files = getEmvCatalogFiles('emv', fileFormat='json')
+        if data_files.exists():
+            return _getEmvEntriesResponse(request, self, data_files)
         else:
             return HttpResponseNotFound()
 
 
-class EmvDataByMethodView(APIView):
+class EmvDataByMethodView(CachedResponseMixin, APIView):
 
     renderer_classes = [JSONRenderer]
+    cache_domains = EMV_DOMAINS
+    cache_timeout = EMV_CACHE_TIMEOUT
 
     def get(self, request, **kwargs):
         """
         Get a list of all EMV entries by method
         method : deepres | monores | blocres | mapq | fscq | daq
         """
-        data_files = []
-        entries = []
-        if 'method' in self.kwargs:
-            method = self.kwargs['method']
-        data_files = _getEmvDataFiles(path="%s/%s" % (EMDB_DATA_DIR, 'emd-*'),
-                                      pattern="*emv_*%s.json" % (method, ))
-        for file in data_files:
-            entries.append(_getJsonEMVEntry(file))
-        if entries:
-            return Response(entries)
+        method = self.kwargs.get('method', '')
+        data_files = getEmvCatalogFiles(
+            'emdb', method=method, fileFormat='json')
+        if data_files.exists():
+            return _getEmvEntriesResponse(request, self, data_files)
         else:
             content = {
                 "request": "EMV: %s" % (method),
@@ -680,30 +751,21 @@ class EmvDataByMethodView(APIView):
             return Response(content, status=status.HTTP_404_NOT_FOUND)
 
 
-class EmvDataByIDView(APIView):
+class EmvDataByIDView(CachedResponseMixin, APIView):
 
     renderer_classes = [JSONRenderer]
+    cache_domains = EMV_DOMAINS
+    cache_timeout = EMV_CACHE_TIMEOUT
 
     def get(self, request, **kwargs):
         """
         Get a list of all EMV entries by DB ID
         db_id : PDB | EMDB
         """
-        data_files = []
-        entries = []
-        if 'db_id' in self.kwargs:
-            db_id = self.kwargs['db_id'].lower()
-            if db_id.startswith('emd-'):
-                path = "%s/%s" % (EMDB_DATA_DIR, db_id)
-                pattern = "%s*_emv_*.json" % (db_id, )
-            else:
-                path = "%s/%s" % (EMDB_DATA_DIR, 'emd-*')
-                pattern = "*%s_emv_*.json" % (db_id, )
-        data_files = _getEmvDataFiles(path, pattern)
-        for file in data_files:
-            entries.append(_getJsonEMVEntry(file))
-        if entries:
-            return Response(entries)
+        db_id = self.kwargs.get('db_id', '').lower()
+        data_files = getEmvCatalogFiles('emdb', db_id=db_id, fileFormat='json')
+        if data_files.exists():
+            return _getEmvEntriesResponse(request, self, data_files)
         else:
             content = {
                 "request": "EMV: %s" % (db_id),
@@ -712,9 +774,11 @@ class EmvDataByIDView(APIView):
             return Response(content, status=status.HTTP_404_NOT_FOUND)
 
 
-class EmvDataByIdMethodView(APIView):
+class EmvDataByIdMethodView(CachedResponseMixin, APIView):
 
-    renderer_classes = [JSONRenderer]
+    renderer_classes = getResidueRendererClasses([JSONRenderer])
+    cache_domains = EMV_DOMAINS
+    cache_timeout = EMV_CACHE_TIMEOUT
 
     def get(self, request, **kwargs):
         """
@@ -722,35 +786,16 @@ class EmvDataByIdMethodView(APIView):
         db_id : PDB | EMDB
         method : deepres | monores | blocres | mapq | fscq | daq
         """
-        data_files = []
-        if 'method' in self.kwargs:
-            method = self.kwargs['method']
-        if 'db_id' in self.kwargs:
-            db_id = self.kwargs['db_id'].lower()
-            if method == 'mapq':
-                # data source: Grigore Pintilie
-                path = os.path.join(PATH_DATA, 'q-score', 'json')
-                if db_id.startswith('emd-'):
-                    pattern = "%s*_emv_%s.json" % (
-                        db_id.replace("emd-", "emd_"), method,)
-                else:
-                    pattern = "*%s_emv_%s.json" % (db_id, method,)
-            elif method == 'daq':
-                # data source: Daisuke Kihara
-                path = os.path.join(PATH_DATA, 'daq', 'json', '**')
-                if db_id.startswith('emd-'):
-                    pattern = "%s*_emv_%s.json" % (db_id, method,)
-                else:
-                    pattern = "*%s_emv_%s.json" % (db_id, method,)
-            else:
-                if db_id.startswith('emd-'):
-                    path = "%s/%s" % (EMDB_DATA_DIR, db_id)
-                    pattern = "*%s.json" % (method, )
-                else:
-                    path = "%s/%s" % (EMDB_DATA_DIR, 'emd-*')
-                    pattern = "*%s_emv_%s.json" % (db_id, method,)
-
-        data_files = _getEmvDataFiles(path, pattern)
+        method = self.kwargs.get('method', '')
+        db_id = self.kwargs.get('db_id', '').lower()
+        if method in ('mapq', 'daq'):
+            # data source: Grigore Pintilie (mapq), Daisuke Kihara (daq)
+            source = method
+        else:
+            source = 'emdb'
+
+        data_files = list(getEmvCatalogFiles(
+            source, db_id=db_id, method=method, fileFormat='json')[:2])
         # there should be only one file for entry/method
         if len(data_files) != 1:
             content = {
@@ -758,11 +803,11 @@ class EmvDataByIdMethodView(APIView):
                 "detail": "Entry not found"
             }
             return Response(content, status=status.HTTP_404_NOT_FOUND)
-        fileName = data_files[0]
-        # return JSON file
-        with open(fileName, 'r') as jfile:
-            resp = json.load(jfile)
-        return Response(resp)
+        if isBinaryRendered(request):
+            # msgpack / Arrow columns of the parsed file
+            return Response(loadJsonFile(data_files[0].path))
+        # return JSON file as stored
+        return jsonFileResponse(request, data_files[0].path)
 
 
 class EmvSourceDataByIdMethodView(APIView):
@@ -780,62 +825,24 @@ class EmvSourceDataByIdMethodView(APIView):
         method = self.kwargs['method'] if 'method' in self.kwargs else ""
         db_id = self.kwargs['db_id'].lower() if 'db_id' in self.kwargs else ""
 
-        path = os.path.join(PATH_DATA)
-        pattern = "*"
         data_files = []
-
-        if method == 'mapq':
-            if fileformat == 'mmcif':
-                # original data from Grigore Pintilie
-                path = os.path.join(
-                    PATH_DATA, 'q-score', 'emdb_qscores')
-                if db_id.startswith('emd-'):
-                    pattern = "%s*.cif" % db_id.replace("emd-", "emd_")
-                else:
-                    pattern = "*pdb_%s.cif" % db_id
-
-            elif fileformat == 'json':
-                # reformated data from Grigore Pintilie
-                path = os.path.join(PATH_DATA, 'q-score', 'json')
-                if db_id.startswith('emd-'):
-                    pattern = "%s*_emv_%s.json" % (
-                        db_id.replace("emd-", "emd_"), method,)
-                else:
-                    pattern = "*%s_emv_%s.json" % (db_id, method,)
-
-        elif method == 'daq':
-            if fileformat == 'pdb':
-                # original data from Kihara Lab
-                path = os.path.join(PATH_DATA, 'daq',
-                                    'data_20230426', '**')
-                if db_id.startswith('emd-'):
-                    pattern = "%s*.pdb" % db_id.replace("emd-", "")
-                else:
-                    pattern = "*%s*.pdb" % db_id
-            elif fileformat == 'json':
-                # reformated data from Kihara Lab
-                path = os.path.join(PATH_DATA, 'daq', 'json', '**')
-                if db_id.startswith('emd-'):
-                    pattern = "%s*_emv_%s.json" % (db_id, method,)
-                else:
-                    pattern = "*%s_emv_%s.json" % (db_id, method,)
-
-        data_files = _getEmvDataFiles(path, pattern)
-        content = ""
-        data_files = [f for f in data_files if os.path.isfile(f)]
+        if (method == 'mapq' and fileformat in ('mmcif', 'json')) or (
+                method == 'daq' and fileformat in ('pdb', 'json')):
+            # mapq: original/reformated data from Grigore Pintilie
+            # daq: original/reformated data from Kihara Lab
+            data_files = getEmvCatalogFiles(
+                method, db_id=db_id, fileFormat=fileformat)
+
+        paths = []
         for data_file in data_files:
-            if data_file.endswith('json'):
-                with open(data_file, 'r') as jfile:
-                    resp = json.load(jfile)
-                return Response(resp)
+            if data_file.fileFormat == 'json':
+                return jsonFileResponse(request, data_file.path)
             else:
-                with open(data_file, 'r') as tfile:
-                    for line in tfile:
-                        content += line
+                paths.append(data_file.path)
 
-        if content:
-            response = HttpResponse(content, content_type='text/plain')
-            return response
+        if paths:
+            filename = data_files[0].filename if len(paths) == 1 else None
+            return fileResponse(request, paths, getContentType(fileformat), filename)
         else:
             content = {
                 "request": "EMV: %s" % (request.path,),
@@ -844,9 +851,39 @@ class EmvSourceDataByIdMethodView(APIView):
             return Response(content, status=status.HTTP_404_NOT_FOUND)
 
 
-class EmvMapQDataAveragesView(APIView):
+MAPQ_AVERAGES_SOURCE = {
+    "method": "MapQ - Q-score - Grigore Pintilie",
+    "citation": "Pintilie, G. & Chiu, W. (2021). Validation, analysis and annotation of cryo-EM structures. Acta Cryst. D77, 1142–1152.",
+    "doi": "doi:10.1107/S2059798321006069"
+}
+MAX_BULK_IDS = 1000
+
+
+def _getMapQAveragesContent(averages, proc_date):
+    software_version = getattr(settings, "APP_VERSION_MAJOR", "") + '.' + getattr(
+        settings, "APP_VERSION_MINOR", "") + '.' + getattr(settings, "APP_VERSION_PATCH", "")
+    return {
+        "resource": "EMV-MapQ-Averages",
+        "methodType": "MapQ",
+        "softwareVersion": software_version,
+        "entry": {
+            "volumeMap": averages["volumeMap"],
+            "atomicModel": averages["atomicModel"],
+            "date": proc_date,
+            "source": MAPQ_AVERAGES_SOURCE
+        },
+        "data": {
+            "averageQScore": averages["averageQScore"],
+            "estimatedResolution": averages["estimatedResolution"]
+        }
+    }
+
+
+class EmvMapQDataAveragesView(CachedResponseMixin, APIView):
 
     renderer_classes = [JSONRenderer]
+    cache_domains = EMV_DOMAINS
+    cache_timeout = EMV_CACHE_TIMEOUT
 
     def get(self, request, **kwargs):
         """
@@ -855,49 +892,13 @@ class EmvMapQDataAveragesView(APIView):
         method : mapq
         """
         db_id = self.kwargs['db_id'].lower() if 'db_id' in self.kwargs else ""
-
-        data_path = os.path.join(PATH_DATA, 'q-score')
-        data_filename = "emd_qscores.txt"
-        dataFile = os.path.join(data_path, data_filename)
-        resource = "EMV-MapQ-Averages"
-        method_type = "MapQ"
-        software_version = getattr(settings, "APP_VERSION_MAJOR", "") + '.' + getattr(
-            settings, "APP_VERSION_MINOR", "") + '.' + getattr(settings, "APP_VERSION_PATCH", "")
-        proc_date = time.strftime(
-            '%Y-%m-%d', time.gmtime(os.path.getmtime(dataFile)))
-        source_data = {
-            "method": "MapQ - Q-score - Grigore Pintilie",
-            "citation": "Pintilie, G. & Chiu, W. (2021). Validation, analysis and annotation of cryo-EM structures. Acta Cryst. D77, 1142–1152.",
-            "doi": "doi:10.1107/S2059798321006069"
-        }
-        content = None
         try:
-            with open(dataFile) as csv_file:
-                csv_reader = csv.reader(csv_file, delimiter='\t')
-                for row in csv_reader:
-                    if db_id.startswith('emd'):
-                        entry_id = row[0].lower().replace('emd_', '')
-                    else:
-                        entry_id = row[1]
-
-                    if db_id.replace('emd-', '') == entry_id:
-                        content = {
-                            "resource": resource,
-                            "methodType": method_type,
-                            "softwareVersion": software_version,
-                            "entry": {
-                                "volumeMap": "EMD-%s" % row[0].replace('emd_', ''),
-                                "atomicModel": row[1],
-                                "date": proc_date,
-                                "source": source_data
-                            },
-                            "data": {
-                                "averageQScore": float(row[2]),
-                                "estimatedResolution": float(row[3])
-                            }
-                        }
-                        return Response(content, status=status.HTTP_200_OK)
-
+            averages = getQScoreAverages(db_id)
+            if averages:
+                proc_date = time.strftime(
+                    '%Y-%m-%d', time.gmtime(getQScoreAveragesDate()))
+                content = _getMapQAveragesContent(averages, proc_date)
+                return Response(content, status=status.HTTP_200_OK)
         except (Exception) as exc:
             logger.exception(exc)
 
@@ -908,25 +909,83 @@ class EmvMapQDataAveragesView(APIView):
         return Response(content, status=status.HTTP_404_NOT_FOUND)
 
 
-def _getConsensusData(db_id):
-    # <EMDB-ID>_emv_localresolution_stats.json
-    fileName = os.path.join(
+class EmvMapQDataAveragesBulkView(CachedResponseMixin, APIView):
+
+    renderer_classes = [JSONRenderer]
+    cache_domains = EMV_DOMAINS
+    cache_timeout = EMV_CACHE_TIMEOUT
+
+    def get(self, request, **kwargs):
+        """
+        Get Average Q-score and Estimated Resolution for a list of entries
+        ids : comma separated DB IDs (PDB | EMDB)
+        """
+        ids = [db_id for db_id in request.query_params.get('ids', '').split(',') if db_id]
+        return self._getBulkResponse(request, ids)
+
+    def post(self, request, **kwargs):
+        """
+        Same as GET, with the DB IDs as a JSON list: {"ids": [...]}
+        """
+        ids = request.data.get('ids', []) if isinstance(request.data, dict) else []
+        if not isinstance(ids, list):
+            ids = []
+        return self._getBulkResponse(request, [str(db_id) for db_id in ids])
+
+    def _getBulkResponse(self, request, ids):
+        if not ids:
+            content = {"request": request.path, "detail": "No DB IDs provided"}
+            return Response(content, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > MAX_BULK_IDS:
+            content = {"request": request.path,
+                       "detail": "Too many DB IDs, max. %s" % MAX_BULK_IDS}
+            return Response(content, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            proc_date = time.strftime(
+                '%Y-%m-%d', time.gmtime(getQScoreAveragesDate()))
+            results = {}
+            for db_id in ids:
+                db_id = db_id.strip().lower()
+                averages = getQScoreAverages(db_id)
+                results[db_id] = _getMapQAveragesContent(
+                    averages, proc_date) if averages else None
+        except (Exception) as exc:
+            logger.exception(exc)
+            content = {
+                "request": "EMV: %s" % (request.path,),
+                "detail": "Q-score averages not available",
+            }
+            return Response(content, status=status.HTTP_404_NOT_FOUND)
+        return Response(results, status=status.HTTP_200_OK)
+
+
+def _getConsensusFilename(db_id):
+    # <EMDB-ID>_emv_localresolution_cons.json
+    return os.path.join(
         EMDB_DATA_DIR, db_id, "%s_emv_%s.json" % (
             db_id,
             'localresolution_cons',
         ))
+
+
+def _getConsensusData(db_id):
+    """
+    Consensus data (shared, do not modify), parsed once per file version
+    """
+    fileName = _getConsensusFilename(db_id)
     try:
-        with open(fileName, 'r') as jfile:
-            jdata = json.load(jfile)
+        jdata = loadJsonFile(fileName)
     except (Exception) as exc:
         logger.exception(exc)
         raise Exception(exc)
     return jdata
 
 
-class EmvDataLocalresConsensus(APIView):
+class EmvDataLocalresConsensus(CachedResponseMixin, APIView):
 
     renderer_classes = [JSONRenderer]
+    cache_domains = EMV_DOMAINS
+    cache_timeout = EMV_CACHE_TIMEOUT
 
     def get(self, request, **kwargs):
         """
@@ -936,6 +995,11 @@ class EmvDataLocalresConsensus(APIView):
         try:
             if 'db_id' in self.kwargs:
                 db_id = self.kwargs['db_id'].lower()
+            sourceFiles = [_getConsensusFilename(db_id)]
+            etag = getFilesETag(sourceFiles, 'consensus')
+            lastModified = getFilesLastModified(sourceFiles)
+            if isNotModified(request, etag, lastModified):
+                return notModifiedResponse(etag, lastModified)
             jdata = _getConsensusData(db_id)
 
             jout = {
@@ -952,44 +1016,21 @@ class EmvDataLocalresConsensus(APIView):
             }
             metrics = []
             for metric in jdata["data"]["metrics"]:
-                metric["unit"] = "Angstrom"
-                metrics.append(metric)
+                metrics.append(dict(metric, unit="Angstrom"))
             jout["data"]["metrics"] = metrics
 
-            return Response(jout, status=status.HTTP_200_OK)
+            return setValidators(
+                Response(jout, status=status.HTTP_200_OK), etag, lastModified)
         except (Exception) as exc:
             logger.exception(exc)
             return not_found_resp(db_id)
 
 
-def _getLocalResDBRank(resolution):
-    """
-        Find the position (rank) in the local resolution stats file by resolution
-    """
-    dataFile = os.path.join(EMDB_DATA_DIR, 'statistics', LOCALRES_HISTORY_FILE)
-    resolutionList = []
-    try:
-        with open(dataFile) as csv_file:
-            csv_reader = csv.reader(csv_file, delimiter='\t')
-            for row in csv_reader:
-                resolutionList.append(float(row[1]))
-    except (Exception) as exc:
-        logger.exception(exc)
-        raise Exception("Could not find %s" % dataFile)
-
-    resolutionList.sort()
-    position = 0
-    for item in resolutionList:
-        if resolution < item:
-            break
-        else:
-            position = position + 1
-    return int(position / len(resolutionList) * 100)
-
-
-class EmvDataLocalresRank(APIView):
+class EmvDataLocalresRank(CachedResponseMixin, APIView):
 
     renderer_classes = [JSONRenderer]
+    cache_domains = EMV_DOMAINS
+    cache_timeout = EMV_CACHE_TIMEOUT
 
     def get(self, request, **kwargs):
         """
@@ -999,11 +1040,20 @@ class EmvDataLocalresRank(APIView):
         try:
             if 'db_id' in self.kwargs:
                 db_id = self.kwargs['db_id'].lower()
+            # the rank also depends on the stats of all entries and the date
+            sourceFiles = [_getConsensusFilename(db_id), LOCALRES_HISTORY_FILE]
+            midnight = datetime.combine(datetime.today(), datetime.min.time())
+            today = midnight.strftime("%Y-%m-%d")
+            etag = getFilesETag(sourceFiles, 'rank' + today)
+            lastModified = max(getFilesLastModified(sourceFiles),
+                               int(midnight.timestamp()))
+            if isNotModified(request, etag, lastModified):
+                return notModifiedResponse(etag, lastModified)
             jdata = _getConsensusData(db_id)
             for metric in jdata['data']['metrics']:
                 if 'resolutionMedian' in metric:
                     resolution = metric['resolutionMedian']
-                    rank = _getLocalResDBRank(resolution)
+                    rank = getLocalResRank(resolution)
         except (Exception) as exc:
             logger.exception(exc)
             return (not_found_resp(db_id))
@@ -1013,7 +1063,7 @@ class EmvDataLocalresRank(APIView):
             "method_type": "Local Resolution",
             "software_version": "0.7.0",
             "entry": {
-                "date": datetime.today().strftime("%Y-%m-%d"),
+                "date": today,
                 "volume_map": "%s" % (db_id),
             },
             "data": {
@@ -1021,6 +1071,94 @@ class EmvDataLocalresRank(APIView):
                 "rank": rank
             }
         }
+        return setValidators(
+            Response(content, status=status.HTTP_200_OK), etag, lastModified)
+
+
+class EmvDataLocalresRanksView(CachedResponseMixin, APIView):
+
+    renderer_classes = [JSONRenderer]
+    cache_domains = EMV_DOMAINS
+    cache_timeout = EMV_CACHE_TIMEOUT
+
+    def get(self, request, **kwargs):
+        """
+        Get the position of several resolutions respect all entries in DB
+        ordered by the consensus of all localresolution EMV
+        resolutions : comma separated resolution values
+        """
+        try:
+            resolutions = [float(value) for value in request.query_params.get(
+                'resolutions', '').split(',') if value]
+        except ValueError:
+            content = {"request": request.path, "detail": "Invalid resolution values"}
+            return Response(content, status=status.HTTP_400_BAD_REQUEST)
+        if not resolutions or len(resolutions) > MAX_BULK_IDS:
+            content = {"request": request.path,
+                       "detail": "Provide between 1 and %s resolutions" % MAX_BULK_IDS}
+            return Response(content, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ranks = getLocalResRanks(resolutions)
+        except (Exception) as exc:
+            logger.exception(exc)
+            return not_found_resp(request.path)
+
+        content = {
+            "resource": "EMV-LocalResolution-DB_Rank",
+            "method_type": "Local Resolution",
+            "software_version": "0.7.0",
+            "entry": {
+                "date": datetime.today().strftime("%Y-%m-%d"),
+            },
+            "data": [{"resolution": resolution, "rank": rank}
+                     for resolution, rank in zip(resolutions, ranks)]
+        }
+        return Response(content, status=status.HTTP_200_OK)
+
+
+class EmvDataLocalresHistogramView(CachedResponseMixin, APIView):
+
+    renderer_classes = [JSONRenderer]
+    cache_domains = EMV_DOMAINS
+    cache_timeout = EMV_CACHE_TIMEOUT
+
+    def get(self, request, **kwargs):
+        """
+        Get the distribution of the consensus localresolution of all entries in DB
+        bins : number of bins (default 20)
+        min, max : <optional> range of the bins (default: whole distribution)
+        """
+        try:
+            bins = int(request.query_params.get('bins', 20))
+            minVal = request.query_params.get('min')
+            maxVal = request.query_params.get('max')
+            minVal = float(minVal) if minVal else None
+            maxVal = float(maxVal) if maxVal else None
+        except ValueError:
+            content = {"request": request.path, "detail": "Invalid histogram parameters"}
+            return Response(content, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < bins <= MAX_HISTOGRAM_BINS:
+            content = {"request": request.path,
+                       "detail": "bins must be between 1 and %s" % MAX_HISTOGRAM_BINS}
+            return Response(content, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            histogram = getLocalResHistogram(bins, minVal, maxVal)
+        except ValueError as exc:
+            content = {"request": request.path, "detail": str(exc)}
+            return Response(content, status=status.HTTP_400_BAD_REQUEST)
+        except (Exception) as exc:
+            logger.exception(exc)
+            return not_found_resp(request.path)
+
+        content = {
+            "resource": "EMV-LocalResolution-DB_Histogram",
+            "method_type": "Local Resolution",
+            "software_version": "0.7.0",
+            "entry": {
+                "date": datetime.today().strftime("%Y-%m-%d"),
+            },
+            "data": histogram
+        }
         return Response(content, status=status.HTTP_200_OK)
 
 
@@ -1035,8 +1173,9 @@ class OntologyViewSet(viewsets.ModelViewSet):
                        OrderingFilter)
 
 
-class OntologyTermViewSet(viewsets.ReadOnlyModelViewSet):
+class OntologyTermViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
 
+    cache_domains = [DATA_STRUCTURES, DATA_IDR]
     serializer_class = OntologyTermSerializer
 
     def get_queryset(self, **kwargs):
@@ -1055,8 +1194,9 @@ class OntologyTermViewSet(viewsets.ReadOnlyModelViewSet):
             return queryset
 
 
-class AllOntologyTermViewSet(viewsets.ReadOnlyModelViewSet):
+class AllOntologyTermViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
 
+    cache_domains = [DATA_STRUCTURES, DATA_IDR]
     serializer_class = OntologyTermSerializer
 
     def get_queryset(self, **kwargs):
@@ -1072,8 +1212,9 @@ class AllOntologyTermViewSet(viewsets.ReadOnlyModelViewSet):
             return queryset
 
 
-class OrganismViewSet(viewsets.ReadOnlyModelViewSet):
+class OrganismViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
 
+    cache_domains = [DATA_STRUCTURES, DATA_IDR]
     serializer_class = OrganismSerializer
 
     def get_queryset(self, **kwargs):
@@ -1123,10 +1264,11 @@ class GetApiVersion(APIView):
 
         return Response(resp)
 
-class NMRViewSetByPDB(viewsets.ModelViewSet):
+class NMRViewSetByPDB(CachedWritableMixin, viewsets.ModelViewSet):
     """
     This viewset automatically provides `list` and `detail` actions.
     """
+    cache_domains = [DATA_NMR]
     serializer_class = FeatureRegionEntitySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filter_backends = (filters.DjangoFilterBackend, SearchFilter,
@@ -1147,10 +1289,11 @@ class NMRViewSetByPDB(viewsets.ModelViewSet):
         return queryset
 
 
-class NMRViewSet(viewsets.ModelViewSet):
+class NMRViewSet(CachedWritableMixin, viewsets.ModelViewSet):
     """
     This viewset automatically provides `list` and `detail` actions.
     """
+    cache_domains = [DATA_NMR]
     serializer_class = FeatureRegionEntitySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filter_backends = (filters.DjangoFilterBackend, SearchFilter,
@@ -1189,10 +1332,11 @@ class NMRViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class NMRTargetsViewSet(APIView):
+class NMRTargetsViewSet(CachedResponseMixin, APIView):
     """
     This viewset automatically provides `list` and `detail` actions.
     """
+    cache_domains = [DATA_NMR]
 
     def get(self, request, uniprot_id=False):
 
@@ -1232,10 +1376,11 @@ class NMRTargetsViewSet(APIView):
         return Response({'count': count, 'results': unique_results})
 
 
-class NMRSourceViewSet(viewsets.ModelViewSet):
+class NMRSourceViewSet(CachedWritableMixin, viewsets.ModelViewSet):
     """
     This viewset automatically provides `list` and `detail` actions.
     """
+    cache_domains = [DATA_NMR]
     serializer_class = FeatureTypeNMRSerializer
     queryset = FeatureType.objects.filter(
         name__exact='NMR-based fragment screening')
@@ -1251,9 +1396,13 @@ class NMRSourceViewSet(viewsets.ModelViewSet):
 WEEK = "w9"
 
 
-class EmvDataByIdDaqView(APIView):
+class EmvDataByIdDaqView(CachedResponseMixin, APIView):
 
-    renderer_classes = [JSONRenderer]
+    # the DAQ entry list is refreshed in the background (daq.py), not by
+    # the update commands
+    cache_domains = ()
+    cache_timeout = EMV_CACHE_TIMEOUT
+    renderer_classes = getResidueRendererClasses([JSONRenderer])
 
     def get(self, request, **kwargs):
         """
@@ -1279,48 +1428,40 @@ class EmvDataByIdDaqView(APIView):
         # 22458_7jsn_E_v2-0
         # 22458_7jsn_F_v1-1
         # 22458_7jsn_F_v2-0
-        entry_list = self.getDaqEntryList()
         # search db_id in the index
-        entries = self.searchDbId(
-            db_id, entry_list, sort=False, reversed=False)
+        entries = daq.findEntries(db_id)
         if entries:
-            emdb_id = 'EMD-' + entries[0][1][0]
-            pdb_id = entries[0][1][1]
+            emdb_id = 'EMD-' + entries[0]["emdb"]
+            pdb_id = entries[0]["pdb"]
             # get all versions
             versions = []
             for entry in entries:
-                version = entry[1][3].replace('v', '').replace('-', '.')
-                if version not in versions:
-                    versions.append(version)
+                if entry["version"] not in versions:
+                    versions.append(entry["version"])
             # get latest version
             latest_version = max(versions)
             # get files of the latest version only
-            # TODO: cache these files to optimize performance
-            data_files = []
-            for entry in entries:
-                version = entry[1][3].replace('v', '').replace('-', '.')
-                filename = entry[0]
-                if version == latest_version:
-                    data_files.append(filename)
-            # get url to download data
-            # https://daqdb.kiharalab.org/data/aa/js/22458_7jsn_B_v2-0_w9.pdb
-            urls = []
-            for data_file in data_files:
-                two_letter_hash = pdb_id[1:3]
-                urls.append("https://daqdb.kiharalab.org/data/aa/%s/%s_%s.pdb" %
-                            (two_letter_hash, data_file, WEEK,))
+            data_files = [entry["name"] for entry in entries
+                          if entry["version"] == latest_version]
+            # get url to download data (served from the local cache if available)
+            urls = [daq.getChainUrl(pdb_id, "%s_%s.pdb" % (data_file, WEEK))
+                    for data_file in data_files]
 
             if fileformat == 'pdb':
                 # original data from Kihara Lab
-                pdb_data = self.getSourceData(urls, format='pdb')
-                return HttpResponse(pdb_data, content_type='text/plain')
+                pdb_data = self.getSourceFiles(urls)
+                if pdb_data:
+                    return fileResponse(
+                        request, pdb_data, getContentType(fileformat))
             elif fileformat == 'mmcif':
                 # reformated data from Kihara Lab
                 # get mmCif format
-                pdb_data = self.getSourceData(urls, format='pdb')
-                cif_header = self.getCifHeader(pdb_id)
-                cif_data = cif_header + '\n' + pdb_data + '\n' + '#'
-                return HttpResponse(cif_data, content_type='text/plain')
+                pdb_data = self.getSourceFiles(urls)
+                if pdb_data:
+                    cif_header = self.getCifHeader(pdb_id)
+                    cif_data = [(cif_header + '\n').encode()] + pdb_data + [b'\n#']
+                    return fileResponse(
+                        request, cif_data, getContentType(fileformat))
             else:
                 # reformated data from Kihara Lab
                 # get JSON format
@@ -1343,80 +1484,30 @@ class EmvDataByIdDaqView(APIView):
         }
         return Response(content, status=status.HTTP_404_NOT_FOUND)
 
+    def getSourceFiles(self, urls):
+        """
+        Local copies of the chain files, each one followed by a new line
+        """
+        segments = []
+        for path in daq.getChainFilePaths(urls):
+            if path is not None:
+                segments += [path, b'\n']
+        return segments
+
     def getSourceData(self, urls, format="json"):
         pdb_data = ""
         chains_data = []
-        for url in urls:
-            try:
-                resp = requests.get(url, timeout=HTTP_TIMEOUT)
-                if resp.status_code == 200:
-                    if format == 'pdb':
-                        pdb_data += resp.text + '\n'
-                    if format == 'json':
-                        chains_data.append(self.pdb2json(resp.text))
-            except Exception as exc:
-                logger.exception(exc)
+        # chain files are fetched concurrently
+        for content in daq.getChainFiles(urls):
+            if content is None:
+                continue
+            if format == 'pdb':
+                pdb_data += content + '\n'
+            if format == 'json':
+                chains_data.append(self.pdb2json(content))
 
         return pdb_data if pdb_data else chains_data
 
-    def getDaqEntryList(self):
-
-        url = "https://daqdb.kiharalab.org/download/current/entry_ids.txt"
-        cache_path = "/tmp/bws/daq"
-        cache_filename = "entry_ids.txt.cache"
-        business_days = 7
-        ndays = datetime.now().timestamp() - business_days * 86400
-        # check recent cached file exists
-        cache_file = Path(cache_path, cache_filename)
-        try:
-            logger.debug("Get the cache file %s" + str(cache_file))
-            if cache_file.exists():
-                logger.debug("Found the cache file %s" + str(cache_file))
-                stat_result = cache_file.stat()
-                modified = datetime.fromtimestamp(
-                    stat_result.st_mtime, tz=timezone.utc)
-                logger.debug("The cache file is newer than %s days: %s" %
-                             (str(business_days), modified))
-                if ndays < stat_result.st_mtime:
-                    logger.debug("Read cache file")
-                    with cache_file.open() as cf:
-                        text_content = cf.readlines()
-                    return text_content
-                logger.debug("The cache file is older than %s days: %s" %
-                             (str(business_days), modified))
-        except Exception as exc:
-            logger.exception(exc)
-
-        # get the list from source
-        try:
-            resp = requests.get(url, timeout=HTTP_TIMEOUT)
-            if not resp.status_code == 200:
-                return []
-            text_content = resp.text.splitlines()
-            # save a cache
-            logger.debug("Create cache path if not exists %s" %
-                         str(cache_path))
-            Path(cache_path).mkdir(parents=True, exist_ok=True)
-            logger.debug("Save the cache file %s" % cache_file)
-            with cache_file.open(mode='w') as cf:
-                for line in text_content:
-                    cf.write(line + os.linesep)
-            return text_content
-        except Exception as exc:
-            logger.exception(exc)
-
-    def searchDbId(self, db_id, entry_list, sort=True, reversed=True):
-        entries = []
-        for entry in entry_list:
-            entry = entry.replace(os.linesep, '')
-            if db_id.replace('emd-', '') in entry.strip():
-                entries.append([entry, entry.split('_')])
-        # return entries
-        if sort:
-            return sorted(entries, key=lambda entry: entry[1][3], reverse=reversed)
-        else:
-            return entries
-
     def pdb2json(self, input_data=""):
 
         chain_data = {}
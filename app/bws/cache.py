@@ -0,0 +1,30 @@
+"""
+File based cache culled from time to time
+"""
+import threading
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+
+
+class RarelyCulledFileBasedCache(FileBasedCache):
+    """
+    FileBasedCache that lists its dir to cull it at most once every
+    CULL_INTERVAL seconds (OPTIONS, 300 by default) per process, instead of
+    on every set. The dir may hold somewhat more than MAX_ENTRIES files
+    between two culls.
+    """
+    _culled = {}
+    _cullLock = threading.Lock()
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._cullInterval = params.get("OPTIONS", {}).get("CULL_INTERVAL", 300)
+
+    def _cull(self):
+        now = time.monotonic()
+        with self._cullLock:
+            if now - self._culled.get(self._dir, -self._cullInterval) < self._cullInterval:
+                return
+            self._culled[self._dir] = now
+        super()._cull()
@@ -1,7 +1,16 @@
 """
 Django rest framework default pagination
 """
+import base64
+import binascii
+import json
+from bisect import bisect_left
+from collections import OrderedDict
+
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -9,3 +18,86 @@ class StandardResultsSetPagination(PageNumberPagination):
     Set pagination limit from query param
     """
     page_size_query_param = 'limit'
+
+
+class SortedListCursorPagination(object):
+    """
+    Cursor pagination of an in-memory list sorted by (str) key.
+    The cursor holds the key of the first (or last) item of the next page,
+    so pages stay consistent while items are added or removed.
+    """
+    page_size = 100
+    max_page_size = 1000
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+
+    def _encodeCursor(self, key, reverse):
+        data = json.dumps({"k": key, "r": reverse}).encode()
+        return base64.urlsafe_b64encode(data).decode()
+
+    def _decodeCursor(self, cursor):
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            key, reverse = data["k"], data["r"]
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound("Invalid cursor")
+        # keys are compared with the (str) keys of the list
+        if not isinstance(key, str) or not isinstance(reverse, bool):
+            raise NotFound("Invalid cursor")
+        return key, reverse
+
+    def _getPageSize(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+            if size > 0:
+                return min(size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def paginate_list(self, request, keys, items, start=0, end=None):
+        """
+        Page of items[start:end] (keys is the sorted list of their keys)
+        """
+        end = len(keys) if end is None else end
+        pageSize = self._getPageSize(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            key, reverse = self._decodeCursor(cursor)
+            if reverse:
+                # page ending before key
+                last = max(min(bisect_left(keys, key, start, end), end), start)
+                first = max(last - pageSize, start)
+            else:
+                first = max(min(bisect_left(keys, key, start, end), end), start)
+                last = min(first + pageSize, end)
+        else:
+            first = start
+            last = min(start + pageSize, end)
+
+        self.request = request
+        self.nextKey = keys[last] if last < end else None
+        self.previousKey = keys[first] if first > start else None
+        return items[first:last]
+
+    def _getLink(self, key, reverse):
+        if key is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self._encodeCursor(key, reverse))
+
+    def get_next_link(self):
+        return self._getLink(self.nextKey, False)
+
+    def get_previous_link(self):
+        if self.previousKey is None:
+            return None
+        return self._getLink(self.previousKey, True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
@@ -95,6 +95,25 @@ TEMPLATES = [
 WSGI_APPLICATION = "bws.wsgi.application"
 
 
+# Caches
+# `responses` is shared by all the workers (see api/response_cache.py)
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # culled every 5 minutes, not on each set (listing the dir)
+    "responses": {
+        "BACKEND": "bws.cache.RarelyCulledFileBasedCache",
+        "LOCATION": os.environ.get("RESPONSE_CACHE_DIR", "/data/cache/responses"),
+        "TIMEOUT": 3600,
+        "OPTIONS": {
+            "MAX_ENTRIES": 50000,
+            "CULL_INTERVAL": 300,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -4,4 +4,9 @@ echo 'Starting http server'
 python manage.py makemigrations &&
 python manage.py migrate &&
 python manage.py rebuild_index --noinput &&
+python manage.py update_entity_flags &&
+python manage.py update_availability &&
+python manage.py update_emv_catalog &&
+{ python manage.py update_daq_entry_list || echo "DAQ entry list not updated"; } &&
+{ python manage.py run_emv_jobs & } &&
 uwsgi --module bws.wsgi:application --http :8000 --master --enable-threads
\ No newline at end of file
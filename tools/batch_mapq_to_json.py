@@ -185,6 +185,8 @@ def saveEmvData(emdbId, pdbId, emv_data):
                 (emdbId, pdbId, dirPath, json_filename))
     with open(str(json_file), "w+") as of:
         of.write(json.dumps(emv_data, indent=2))
+    # compact .json.gz (.json.br) copies, served by the API when accepted
+    save_json_sidecars(emv_data, json_file)
 
 
 def main(argv):
@@ -14,6 +14,11 @@ import logging
 from io import BytesIO
 from pathlib import Path
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 PARAM_FIELDS = [
     'map', 'sampling', 'threshold', 'resolution', 'mapCoordX', 'mapCoordY',
     'mapCoordZ', 'map1', 'map2', 'avgs', 'avgSampling', 'symmetry',
@@ -98,6 +103,25 @@ def save_json(data, path, filename, createIfNotExist=True):
     return f.name
 
 
+def save_json_sidecars(data, fileName, withBrotli=True):
+    """
+    Save compact, precompressed copies of a json file, next to it:
+    <fileName>.gz and, if brotli is installed, <fileName>.br
+    The API sends them to the clients accepting those encodings
+    """
+    content = json.dumps(data, separators=(',', ':')).encode()
+    sidecars = [(str(fileName) + '.gz', gzip.compress(content, 9, mtime=0))]
+    if withBrotli and brotli is not None:
+        sidecars.append((str(fileName) + '.br', brotli.compress(content)))
+    for sidecarName, compressed in sidecars:
+        logger.info("Save json sidecar %s" % (sidecarName, ))
+        tmpName = sidecarName + '.tmp'
+        with open(tmpName, 'wb') as f:
+            f.write(compressed)
+        os.replace(tmpName, sidecarName)
+    return [sidecarName for sidecarName, compressed in sidecars]
+
+
 def read_json(fileName):
     try:
         with open(fileName) as json_file: